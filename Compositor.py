@@ -0,0 +1,465 @@
+# 纯张量合成引擎：缩放、镜像、旋转、平移和 alpha 混合全部在 float32 张量上完成，
+# 不经过 PIL，也不会量化到 8 位。节点模块在执行时才导入本模块，避免启动时加载 torch。
+import math
+import os
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+import torch
+import torch.nn.functional as F
+
+from .Instrumentation import logger
+from .TensorCache import TensorCache, budget_from_env
+
+_threads_configured = False
+
+# 共享线程池，按线程数缓存，避免每次执行都重新创建
+_executors = {}
+_executor_lock = threading.Lock()
+
+# 变换结果缓存：同一图层张量以相同参数反复放置时（模板化任务），跳过缩放/镜像/旋转直接混合。
+# 内存预算由 S4TOOL_TRANSFORM_CACHE_MB 配置（默认 256MB，0 为禁用）
+_transform_cache = TensorCache(budget_from_env("S4TOOL_TRANSFORM_CACHE_MB", 256))
+
+def configure_threads():
+    """
+    根据环境变量 S4TOOL_NUM_THREADS 设置 torch 的 CPU 线程数（只设置一次）。
+    未设置时使用 torch 默认值（通常为全部物理核心）。
+    """
+    global _threads_configured
+    if _threads_configured:
+        return
+    _threads_configured = True
+    num_threads = os.environ.get("S4TOOL_NUM_THREADS")
+    if num_threads:
+        torch.set_num_threads(max(1, int(num_threads)))
+
+def resolve_workers(workers=None):
+    """
+    并行线程数：参数为正数时直接使用，否则读取环境变量 S4TOOL_WORKERS。
+    都未设置时按 CPU 核心数 // torch 线程数计算：每个工作线程内的 torch 运算还会使用
+    torch.get_num_threads() 个线程，这样总线程数不超过核心数。torch 默认使用全部核心，
+    此时为 1（只靠 torch 自身的并行）；降低 S4TOOL_NUM_THREADS 即可换成按帧/分块并行。
+    """
+    if not workers:
+        workers = int(os.environ.get("S4TOOL_WORKERS") or 0)
+    if not workers:
+        workers = (os.cpu_count() or 1) // max(1, torch.get_num_threads())
+    elif workers * torch.get_num_threads() > (os.cpu_count() or 1):
+        logger.debug("S4Tool: %d workers x %d torch threads exceeds %d CPU cores",
+                     workers, torch.get_num_threads(), os.cpu_count() or 1)
+    return max(1, int(workers))
+
+def parallel_map(function, items, workers=None):
+    """
+    在共享线程池中对 items 执行 function 并按顺序返回结果；只有一项或一个线程时直接串行执行。
+    torch 和 PIL 的计算会释放 GIL，因此线程可以真正并行。
+    """
+    items = list(items)
+    workers = min(resolve_workers(workers), len(items))
+    if workers <= 1:
+        return [function(item) for item in items]
+    with _executor_lock:
+        executor = _executors.get(workers)
+        if executor is None:
+            executor = _executors[workers] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="S4Tool")
+    return list(executor.map(function, items))
+
+def mask_to_alpha(mask):
+    """
+    将 MASK (B, H, W) 转换为 alpha (B, H, W)。
+    与原实现一致：覆盖完整 0-1 范围的掩码视为 ComfyUI 风格（1 为透明），需要反转。
+    """
+    mask = mask.float()
+    flat = mask.reshape(mask.shape[0], -1)
+    invert = (flat.amax(dim=1) >= 1.0) & (flat.amin(dim=1) < 1.0 / 255.0)
+    return torch.where(invert.view(-1, 1, 1), 1.0 - mask, mask)
+
+def premultiply(rgba):
+    # 直通 alpha -> 预乘 alpha（返回新张量）
+    return torch.cat((rgba[..., :3] * rgba[..., 3:], rgba[..., 3:]), dim=-1)
+
+def unpremultiply_(rgba):
+    # 预乘 alpha -> 直通 alpha（原地），alpha 为 0 的像素颜色为 0
+    alpha = rgba[..., 3:]
+    rgba[..., :3].div_(torch.where(alpha > 0.0, alpha, torch.ones_like(alpha))).clamp_(0.0, 1.0)
+    return rgba
+
+def background_output(background, batch_size, with_alpha=False):
+    """
+    没有可见图层时的输出：背景广播到 batch_size；with_alpha 时为直通 alpha 的 RGBA（RGB 背景的 alpha 为 1）。
+    """
+    background = background.expand(batch_size, -1, -1, -1)
+    if not with_alpha:
+        return background[..., :3]
+    if background.shape[-1] == 4:
+        return background.float()
+    return torch.cat((background[..., :3].float(), torch.ones(background.shape[:3] + (1,))), dim=-1)
+
+def layer_to_rgba(layer, mask=None):
+    """
+    将 IMAGE (B, H, W, C) 与可选 MASK 合并为 (B, H, W, 4) 的预乘 alpha 浮点张量。
+    RGB 图层的 alpha 为 1；提供掩码时掩码替代图层自带的 alpha，并缩放到图层尺寸。
+    之后的重采样和混合都在预乘空间进行，透明边缘不会渗入颜色。
+    """
+    layer = layer.float()
+    height, width = layer.shape[1], layer.shape[2]
+    if mask is None:
+        if layer.shape[-1] == 4:
+            return premultiply(layer)
+        alpha = torch.ones(layer.shape[:3], dtype=layer.dtype)
+    else:
+        alpha = mask_to_alpha(mask)
+        if alpha.shape[1:] != (height, width):
+            alpha = F.interpolate(alpha.unsqueeze(1), size=(height, width), mode="bilinear",
+                                  align_corners=False, antialias=True).squeeze(1).clamp_(0.0, 1.0)
+    batch_size = max(layer.shape[0], alpha.shape[0])
+    alpha = alpha.unsqueeze(-1)
+    return torch.cat((layer[..., :3] * alpha, alpha.expand(batch_size, -1, -1, -1)), dim=-1)
+
+# 重采样滤波器名称 -> (F.interpolate 模式, F.grid_sample 模式)
+_RESAMPLE_MODES = {
+    "Bicubic": ("bicubic", "bicubic"),
+    "Bilinear": ("bilinear", "bilinear"),
+    "Nearest": ("nearest-exact", "nearest"),
+}
+
+def _scaled_size(width, height, scale):
+    # 与原实现一致：目标尺寸取 int(原尺寸 * scale)
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+def scale_layer(rgba, scale, resample="Bicubic"):
+    height, width = rgba.shape[1], rgba.shape[2]
+    target_width, target_height = _scaled_size(width, height, scale)
+    if (target_width, target_height) == (width, height):
+        return rgba
+    mode = _RESAMPLE_MODES[resample][0]
+    chw = rgba.permute(0, 3, 1, 2)
+    if mode == "nearest-exact":
+        chw = F.interpolate(chw, size=(target_height, target_width), mode=mode)
+    else:
+        chw = F.interpolate(chw, size=(target_height, target_width), mode=mode,
+                            align_corners=False, antialias=True).clamp_(0.0, 1.0)
+    return chw.permute(0, 2, 3, 1)
+
+def mirror_layer(rgba, mirror):
+    if mirror == "Horizontal":
+        return torch.flip(rgba, dims=[2])
+    if mirror == "Vertical":
+        return torch.flip(rgba, dims=[1])
+    return rgba
+
+def rotation_matrix(width, height, angle):
+    """
+    复刻 PIL Image.rotate(angle, expand=True) 的几何：返回 (输出宽, 输出高, 矩阵)，
+    矩阵把输出像素坐标映射回输入像素坐标。
+    """
+    radians = -math.radians(angle)
+    a, b = round(math.cos(radians), 15), round(math.sin(radians), 15)
+    d, e = round(-math.sin(radians), 15), round(math.cos(radians), 15)
+    center_x, center_y = width / 2.0, height / 2.0
+    c = a * -center_x + b * -center_y + center_x
+    f = d * -center_x + e * -center_y + center_y
+    xs, ys = [], []
+    for x, y in ((0, 0), (width, 0), (width, height), (0, height)):
+        xs.append(a * x + b * y + c)
+        ys.append(d * x + e * y + f)
+    new_width = math.ceil(max(xs)) - math.floor(min(xs))
+    new_height = math.ceil(max(ys)) - math.floor(min(ys))
+    offset_x, offset_y = -(new_width - width) / 2.0, -(new_height - height) / 2.0
+    c, f = a * offset_x + b * offset_y + c, d * offset_x + e * offset_y + f
+    return new_width, new_height, (a, b, c, d, e, f)
+
+def transform_matrix(width, height, scale, mirror, angle):
+    """
+    将缩放 -> 镜像 -> 旋转合并为一个仿射矩阵：返回 (输出宽, 输出高, 矩阵)，
+    矩阵把输出像素坐标映射回源图像素坐标，几何与依次执行三个变换一致。
+    """
+    scaled_width, scaled_height = _scaled_size(width, height, scale)
+    out_width, out_height, (a, b, c, d, e, f) = rotation_matrix(scaled_width, scaled_height, angle)
+    # 镜像：旋转前坐标 -> 镜像前坐标
+    if mirror == "Horizontal":
+        a, b, c = -a, -b, scaled_width - c
+    elif mirror == "Vertical":
+        d, e, f = -d, -e, scaled_height - f
+    # 缩放：缩放后坐标 -> 源图坐标
+    scale_x, scale_y = width / scaled_width, height / scaled_height
+    return out_width, out_height, (a * scale_x, b * scale_x, c * scale_x, d * scale_y, e * scale_y, f * scale_y)
+
+def affine_sample(rgba, matrices, out_width, out_height, mode="bilinear"):
+    """
+    按逐帧仿射矩阵（输出像素 -> 输入像素）对 (B, H, W, 4) 进行采样（bilinear/bicubic/nearest），
+    输出 (B, out_height, out_width, 4)，超出源图的区域为全透明。
+    """
+    batch_size = max(matrices.shape[0], rgba.shape[0])
+    height, width = rgba.shape[1], rgba.shape[2]
+    matrices = matrices.expand(batch_size, -1, -1)
+    # 输出像素中心坐标
+    ys = torch.arange(out_height, dtype=torch.float32) + 0.5
+    xs = torch.arange(out_width, dtype=torch.float32) + 0.5
+    grid_y, grid_x = torch.meshgrid(ys, xs, indexing="ij")
+    coords = torch.stack((grid_x, grid_y, torch.ones_like(grid_x)), dim=-1)  # (h, w, 3)
+    source = torch.einsum("hwk,bjk->bhwj", coords, matrices)  # (B, h, w, 2)，输入像素坐标
+    # 转换为 grid_sample 的归一化坐标（align_corners=False）
+    source[..., 0].mul_(2.0 / width).sub_(1.0)
+    source[..., 1].mul_(2.0 / height).sub_(1.0)
+    chw = rgba.permute(0, 3, 1, 2)
+    if chw.shape[0] != batch_size:
+        chw = chw.expand(batch_size, -1, -1, -1)
+    sampled = F.grid_sample(chw, source, mode=mode, padding_mode="zeros", align_corners=False)
+    if mode == "bicubic":
+        sampled.clamp_(0.0, 1.0)
+    return sampled.permute(0, 2, 3, 1)
+
+def _fused_transform(rgba, scale, mirror, angles, resample):
+    """
+    对一组帧执行缩放、镜像和旋转，只重采样一次。
+    旋转为 90 度的整数倍时缩放使用带抗锯齿的插值，镜像和旋转为无损拷贝；
+    其余情况把三个变换合并为逐帧仿射矩阵，用 grid_sample 一次完成。
+    """
+    angles = [angle % 360.0 for angle in angles]
+    if len(set(angles)) == 1 and angles[0] in (0.0, 90.0, 180.0, 270.0):
+        layer = mirror_layer(scale_layer(rgba, scale, resample), mirror)
+        if angles[0] == 0.0:
+            return layer
+        return torch.rot90(layer, k=int(angles[0] // 90), dims=(1, 2))
+
+    height, width = rgba.shape[1], rgba.shape[2]
+    geometry = [transform_matrix(width, height, scale, mirror, angle) for angle in angles]
+    out_width = max(g[0] for g in geometry)
+    out_height = max(g[1] for g in geometry)
+    matrices = torch.tensor([[g[2][0:3], g[2][3:6]] for g in geometry], dtype=torch.float32)
+    interpolate_mode, sample_mode = _RESAMPLE_MODES[resample]
+    # grid_sample 没有抗锯齿：大幅缩小时先按整数倍取平均，再把矩阵换算到缩小后的坐标
+    factor = int(1.0 / scale) if interpolate_mode != "nearest-exact" else 1
+    if factor >= 2 and min(height, width) >= factor:
+        rgba = F.avg_pool2d(rgba.permute(0, 3, 1, 2), factor).permute(0, 2, 3, 1)
+        matrices /= factor
+    return affine_sample(rgba, matrices, out_width, out_height, sample_mode)
+
+def transform_layers(rgba, scales, mirror, rotations, workers=None, resample="Bicubic"):
+    """
+    对图层批次执行缩放 -> 镜像 -> 旋转（合并为一次重采样，见 _fused_transform）。
+    scales/rotations 为逐帧参数列表（长度即输出帧数），rgba 的批次为 1（广播）或与帧数一致。
+    相同缩放的帧合并为一组批量处理，各组在线程池中并行；角度不同导致尺寸不同时，
+    统一填充到组内最大尺寸，内容对齐左上角，填充区域透明。
+    返回 [(帧索引列表, (n, h, w, 4) 张量)]，张量的第 k 帧对应帧索引列表的第 k 项。
+    """
+    batch_size = len(scales)
+
+    def transform_group(scale):
+        indices = [i for i in range(batch_size) if scales[i] == scale]
+        source = rgba if rgba.shape[0] == 1 else rgba[indices]
+        angles = [rotations[i] for i in indices]
+        if len(set(angles)) == 1:
+            angles = angles[:1]  # 所有帧共用同一变换，只计算一次
+        return (indices, _fused_transform(source, scale, mirror, angles, resample))
+
+    return parallel_map(transform_group, dict.fromkeys(scales), workers)
+
+def _transform_key(layer_image, layer_mask, params):
+    # 以张量对象身份和版本号（原地修改时递增）作为键；条目中的弱引用保证对象仍然存活
+    mask_key = None if layer_mask is None else (id(layer_mask), layer_mask._version)
+    return (id(layer_image), layer_image._version, mask_key, params)
+
+def lookup_transform(layer_image, layer_mask, params):
+    """
+    查找图层张量 + 掩码 + 变换参数对应的变换结果（transform_layers 的返回值），未命中返回 None。
+    """
+    entry = _transform_cache.get(_transform_key(layer_image, layer_mask, params))
+    if entry is None:
+        return None
+    image_ref, mask_ref, groups = entry
+    if image_ref() is not layer_image or (layer_mask is not None and mask_ref() is not layer_mask):
+        return None
+    return groups
+
+def store_transform(layer_image, layer_mask, params, groups):
+    """
+    缓存变换结果。源张量被释放时通过弱引用回调立即移除条目，避免 id 复用导致误命中。
+    """
+    key = _transform_key(layer_image, layer_mask, params)
+    evict = lambda _ref: _transform_cache.pop(key)
+    image_ref = weakref.ref(layer_image, evict)
+    mask_ref = None if layer_mask is None else weakref.ref(layer_mask, evict)
+    _transform_cache.put(key, (image_ref, mask_ref, groups))
+    return groups
+
+def _frame_index(indices):
+    # 连续帧使用切片（返回视图，可原地修改），否则使用索引列表
+    if indices == list(range(indices[0], indices[0] + len(indices))):
+        return slice(indices[0], indices[0] + len(indices))
+    return torch.tensor(indices)
+
+def _soft_light(backdrop, source):
+    # W3C 合成规范中的 soft-light
+    darken = backdrop - (1.0 - 2.0 * source) * backdrop * (1.0 - backdrop)
+    curve = torch.where(backdrop <= 0.25, ((16.0 * backdrop - 12.0) * backdrop + 4.0) * backdrop, torch.sqrt(backdrop))
+    lighten = backdrop + (2.0 * source - 1.0) * (curve - backdrop)
+    return torch.where(source <= 0.5, darken, lighten)
+
+def _overlay(backdrop, source):
+    # 以背景为条件的 hard-light
+    multiply = 2.0 * backdrop * source
+    screen = 1.0 - 2.0 * (1.0 - backdrop) * (1.0 - source)
+    return torch.where(backdrop <= 0.5, multiply, screen)
+
+# 混合函数 B(背景, 前景)，参数和结果均为直通（非预乘）颜色
+_BLEND_KERNELS = {
+    "Multiply": torch.mul,
+    "Screen": lambda backdrop, source: backdrop + source - backdrop * source,
+    "Overlay": _overlay,
+    "Add": lambda backdrop, source: (backdrop + source).clamp_(max=1.0),
+    "Soft Light": _soft_light,
+    "Darken": torch.minimum,
+    "Lighten": torch.maximum,
+}
+
+def _straight(color, alpha):
+    # 预乘颜色 -> 直通颜色，alpha 为 0 时为 0
+    return color / torch.where(alpha > 0.0, alpha, torch.ones_like(alpha))
+
+def _blend_region(result, indices, crop, top, left, opacity=1.0, blend_mode="Normal"):
+    """
+    在 result 的 indices 帧、以 (top, left) 为左上角的矩形内混合预乘 alpha 的 crop (n, h, w, 4)。
+    result 为 RGB（背景不透明）或预乘 alpha 的 RGBA。
+    Normal 对每个通道执行一次 over：fg + bg * (1 - a)；其他模式按 W3C 合成规范：
+    fg * (1 - ab) + bg * (1 - a) + a * ab * B(背景, 前景)，alpha 与 Normal 相同。
+    """
+    if blend_mode != "Normal" and blend_mode not in _BLEND_KERNELS:
+        raise ValueError(f"Unsupported blend mode: {blend_mode}")
+    frame_index = _frame_index(indices)
+    bottom, right = top + crop.shape[1], left + crop.shape[2]
+    if opacity != 1.0:
+        crop = crop * opacity
+    alpha = crop[..., 3:]
+    region = result[frame_index, top:bottom, left:right]
+    if blend_mode == "Normal":
+        region.mul_(1.0 - alpha).add_(crop[..., :region.shape[-1]]).clamp_(0.0, 1.0)
+    else:
+        backdrop = region[..., :3]
+        if region.shape[-1] == 4:
+            backdrop_alpha = region[..., 3:]
+            mixed = _BLEND_KERNELS[blend_mode](_straight(backdrop, backdrop_alpha), _straight(crop[..., :3], alpha))
+            mixed.mul_(alpha * backdrop_alpha).add_(crop[..., :3] * (1.0 - backdrop_alpha))
+            backdrop_alpha.mul_(1.0 - alpha).add_(alpha)
+        else:
+            mixed = _BLEND_KERNELS[blend_mode](backdrop, _straight(crop[..., :3], alpha)).mul_(alpha)
+        backdrop.mul_(1.0 - alpha).add_(mixed).clamp_(0.0, 1.0)
+    if not isinstance(frame_index, slice):
+        result[frame_index, top:bottom, left:right] = region
+
+def _collect_regions(groups, xs, ys, height, width):
+    """
+    按 (组, 位置) 汇总图层与画布相交的区域，同一位置的帧一次性向量化处理。
+    返回 [(帧索引列表, (n, h, w, 4) 裁剪后的图层, (top, bottom, left, right))]。
+    """
+    regions = []
+    for indices, layer in groups:
+        layer_height, layer_width = layer.shape[1], layer.shape[2]
+        positions = {}
+        for k, i in enumerate(indices):
+            positions.setdefault((xs[i], ys[i]), []).append((k, i))
+        for (x, y), frames in positions.items():
+            left, top = max(0, x), max(0, y)
+            right, bottom = min(width, x + layer_width), min(height, y + layer_height)
+            if right <= left or bottom <= top:
+                continue
+            crop = layer[:, top - y:bottom - y, left - x:right - x]
+            if layer.shape[0] > 1:
+                crop = crop[[k for k, _ in frames]]
+            regions.append(([i for _, i in frames], crop, (top, bottom, left, right)))
+    return regions
+
+def _frame_chunks(batch_size, count):
+    # 将 [0, batch_size) 均分为 count 个连续区间
+    count = max(1, min(count, batch_size))
+    bounds = [batch_size * i // count for i in range(count + 1)]
+    return [(bounds[i], bounds[i + 1]) for i in range(count)]
+
+def _select_frames(indices, crop, start, end):
+    # 只保留落在 [start, end) 内的帧；crop 批次为 1 时对所有帧广播
+    selected = [k for k, i in enumerate(indices) if start <= i < end]
+    if not selected:
+        return None, None
+    if len(selected) == len(indices):
+        return indices, crop
+    if crop.shape[0] > 1:
+        if selected == list(range(selected[0], selected[-1] + 1)):
+            crop = crop[selected[0]:selected[-1] + 1]
+        else:
+            crop = crop[selected]
+    return [indices[k] for k in selected], crop
+
+def _composite_parallel(background, layers, batch_size, tile_size, workers, with_alpha=False):
+    """
+    并行合成：输出张量预先分配，按 (帧区间, 分块) 拆分为互不重叠的工作项，在共享线程池中处理。
+    每个工作项把自己的背景区域写入输出并依次混合与之相交的图层区域。
+    with_alpha 时输出为 RGBA：背景区域在输出中就地转为预乘 alpha，混合完成后再就地还原为直通 alpha。
+    未分块时按工作线程数拆分帧；分块时每个分块包含所有帧，中间结果只与分块大小相关。
+    """
+    height, width = background.shape[1], background.shape[2]
+    workers = resolve_workers(workers)
+    channels = 4 if with_alpha else 3
+    result = torch.empty((batch_size, height, width, channels), dtype=torch.float32)
+
+    if tile_size > 0:
+        chunks = [(0, batch_size)]
+        rects = [(top, left, min(height, top + tile_size), min(width, left + tile_size))
+                 for top in range(0, height, tile_size) for left in range(0, width, tile_size)]
+    else:
+        chunks = _frame_chunks(batch_size, workers)
+        rects = [(0, 0, height, width)]
+
+    def process(item):
+        (start, end), (top, left, bottom, right) = item
+        source = background[start:end, top:bottom, left:right]
+        target = result[start:end, top:bottom, left:right]
+        target[..., :3] = source[..., :3]
+        if with_alpha:
+            if source.shape[-1] == 4:
+                target[..., 3:] = source[..., 3:]
+                target[..., :3].mul_(target[..., 3:])
+            else:
+                target[..., 3].fill_(1.0)
+        for regions, opacity, blend_mode in layers:
+            for indices, crop, (region_top, region_bottom, region_left, region_right) in regions:
+                inner_top, inner_bottom = max(top, region_top), min(bottom, region_bottom)
+                inner_left, inner_right = max(left, region_left), min(right, region_right)
+                if inner_bottom <= inner_top or inner_right <= inner_left:
+                    continue
+                frame_indices, frame_crop = _select_frames(indices, crop, start, end)
+                if frame_indices is None:
+                    continue
+                sub_crop = frame_crop[:, inner_top - region_top:inner_bottom - region_top,
+                                      inner_left - region_left:inner_right - region_left]
+                _blend_region(result, frame_indices, sub_crop, inner_top, inner_left, opacity, blend_mode)
+        if with_alpha:
+            unpremultiply_(target)
+
+    parallel_map(process, [(chunk, rect) for chunk in chunks for rect in rects], workers)
+    return result
+
+def composite_stack(background, placements, batch_size, tile_size=0, workers=None, with_alpha=False):
+    """
+    将多个图层依次（自底向上）合成到同一个累加器上，背景只复制一次。
+    background 为 RGB（视为不透明）或直通 alpha 的 RGBA；输出为 RGB，with_alpha 时为直通 alpha 的 RGBA，
+    内部按分块转为预乘 alpha 合成，不产生整幅画布大小的临时张量。
+    placements 为 [(groups, xs, ys, opacity, blend_mode)]，groups 来自 transform_layers。
+    只在图层与背景相交的矩形区域内混合，其余像素直接沿用背景；
+    没有任何图层与背景相交时返回 background_output（RGB 时为广播视图，不做复制）。
+    tile_size > 0 时按分块处理，适合超大画布；workers 为线程数（见 resolve_workers）。
+    """
+    height, width = background.shape[1], background.shape[2]
+    layers = []
+    for groups, xs, ys, opacity, blend_mode in placements:
+        regions = _collect_regions(groups, xs, ys, height, width)
+        if regions and opacity > 0.0:
+            layers.append((regions, opacity, blend_mode))
+
+    # 输出批次始终为 batch_size；输出为新分配的张量，不会修改上游节点的输入
+    if not layers:
+        return background_output(background, batch_size, with_alpha)
+    background = background.expand(batch_size, -1, -1, -1)
+    return _composite_parallel(background, layers, batch_size, tile_size, workers, with_alpha)
@@ -1,4 +1,4 @@
-from .ImageOverlay import pil2tensor, tensor2pil  # 导入共享的辅助函数
+from .Instrumentation import logger, debug_enabled, stage
 
 class ImageBlendWithAlpha:
     """
@@ -24,46 +24,38 @@ class ImageBlendWithAlpha:
     OUTPUT_NODE = False
 
     def join_image_with_alpha(self, image, alpha):
-        from PIL import Image
         import torch
-        import numpy as np
-
-        # 将输入张量转换为 PIL 图像
-        image_pil = tensor2pil(image).convert('RGB')  # 确保是 RGB 格式
-        alpha_pil = tensor2pil(alpha).convert('L')    # 确保 Alpha 是单通道灰度图
+        import torch.nn.functional as F
+
+        # 统一为批次格式：IMAGE 为 (B, H, W, C)，MASK 为 (B, H, W)
+        if image.dim() == 3:
+            image = image.unsqueeze(0)
+        if alpha.dim() == 2:
+            alpha = alpha.unsqueeze(0)
+        batch_size = max(image.shape[0], alpha.shape[0])
+        for name, tensor in (("image", image), ("alpha", alpha)):
+            if tensor.shape[0] not in (1, batch_size):
+                raise ValueError(f"{name} has batch size {tensor.shape[0]}, expected 1 or {batch_size}")
+        height, width = image.shape[1], image.shape[2]
+        alpha = alpha.to(image.device, torch.float32)
 
         # 调试信息
-        print(f"Image PIL size: {image_pil.size}, mode: {image_pil.mode}")
-        print(f"Alpha PIL size: {alpha_pil.size}, mode: {alpha_pil.mode}, min: {np.array(alpha_pil).min()/255}, max: {np.array(alpha_pil).max()/255}")
-
-        # 如果 Alpha 通道尺寸与图像不匹配，则调整 Alpha 大小
-        if alpha_pil.size != image_pil.size:
-            print(f"Resizing alpha from {alpha_pil.size} to {image_pil.size}")
-            alpha_pil = alpha_pil.resize(image_pil.size, Image.Resampling.LANCZOS)
-
-        # 确保 Alpha 值在 0-255 范围内
-        alpha_array = np.array(alpha_pil)
-        if alpha_array.max() <= 1.0:  # 如果 Alpha 是归一化值 (0-1)
-            alpha_array = (alpha_array * 255).astype(np.uint8)
-        elif alpha_array.max() > 255:  # 如果值超过 255，裁剪
-            alpha_array = np.clip(alpha_array, 0, 255).astype(np.uint8)
-
-        # 反转 Alpha 蒙版：HeaderMask.png 中黑色（值 0）为不透明区域，应保留图像；非黑色（值 255）为透明区域，应移除图像
-        alpha_array = 255 - alpha_array
-        alpha_pil = Image.fromarray(alpha_array, mode='L')
-
-        # 调试反转后的 Alpha 值
-        print(f"Inverted Alpha min: {alpha_array.min()/255}, max: {alpha_array.max()/255}")
-
-        # 创建一个透明的 RGBA 图像
-        rgba_image = Image.new('RGBA', image_pil.size, (0, 0, 0, 0))  # 全透明背景
-        # 使用反转后的 Alpha 蒙版粘贴图像，保留不透明区域（HeaderMask.png 中黑色部分）
-        rgba_image.paste(image_pil, (0, 0), alpha_pil)
-
-        # 调试输出
-        rgba_array = np.array(rgba_image)
-        print(f"RGBA output shape: {rgba_array.shape}, alpha min: {rgba_array[..., 3].min()/255}, alpha max: {rgba_array[..., 3].max()/255}")
-
-        # 转换为张量输出（保持 RGBA 格式）
-        output_tensor = pil2tensor(rgba_image)
-        return (output_tensor,)
\ No newline at end of file
+        if debug_enabled():
+            logger.debug("ImageBlendWithAlpha: image %s, alpha %s, output batch %d",
+                         tuple(image.shape), tuple(alpha.shape), batch_size)
+
+        with stage("ImageBlendWithAlpha", "composite"):
+            # 如果 Alpha 通道尺寸与图像不匹配，则整批调整 Alpha 大小
+            if alpha.shape[1:] != (height, width):
+                alpha = F.interpolate(alpha.unsqueeze(1), size=(height, width), mode="bicubic",
+                                      align_corners=False, antialias=True).squeeze(1).clamp_(0.0, 1.0)
+                # 反转 Alpha 蒙版：黑色（值 0）为不透明区域，应保留图像；白色（值 1）为透明区域，应移除图像
+                alpha = alpha.mul_(-1.0).add_(1.0)
+            else:
+                alpha = 1.0 - alpha
+
+            # 与 JoinImageWithAlpha 一致：RGB 保持不变，反转后的蒙版作为第 4 通道，单个蒙版或图像广播到整个批次
+            rgb = image[..., :3].float().expand(batch_size, -1, -1, -1)
+            alpha = alpha.expand(batch_size, -1, -1).unsqueeze(-1)
+            output_tensor = torch.cat((rgb, alpha), dim=-1)
+        return (output_tensor,)
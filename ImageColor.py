@@ -1,5 +1,86 @@
-from .ImageOverlay import pil2tensor  # 导入共享的辅助函数
-import torch  # 显式导入 torch 以避免 NameError
+import math
+
+# torch 只在执行时导入，注册节点时不加载重量级依赖
+from .ImageOverlay import _frame_values, _expand_to_batch
+from .Instrumentation import logger, debug_enabled, stage
+from .TensorCache import TensorCache, budget_from_env
+
+# 已生成图片的缓存（单帧），按解析后的参数索引，内存预算由 S4TOOL_COLOR_CACHE_MB 配置（默认 128MB，0 为禁用）
+_generated_cache = TensorCache(budget_from_env("S4TOOL_COLOR_CACHE_MB", 128))
+
+# 解析 HEX 颜色为 RGB（无透明度，固定为不透明）
+def hex_to_rgb(hex_color):
+    hex_color = hex_color.strip().lstrip('#')
+    if len(hex_color) == 3:
+        hex_color = ''.join(c * 2 for c in hex_color)
+    r = int(hex_color[0:2], 16)
+    g = int(hex_color[2:4], 16)
+    b = int(hex_color[4:6], 16)
+    return (r, g, b)
+
+def parse_gradient_stops(stops_text, start_hex, end_hex):
+    """
+    解析多色渐变节点，格式为 "#000000 0, #FF0000 0.5, #FFFFFF 1"（位置范围 0-1）。
+    省略位置时均匀分布；为空时使用起始色和结束色两个节点。返回按位置排序的 [(位置, (r, g, b))]。
+    """
+    entries = [entry.split() for entry in (stops_text or "").split(",") if entry.strip()]
+    if not entries:
+        return [(0.0, hex_to_rgb(start_hex)), (1.0, hex_to_rgb(end_hex))]
+    stops = []
+    for index, parts in enumerate(entries):
+        if len(parts) > 1:
+            position = float(parts[1])
+        else:
+            position = index / max(1, len(entries) - 1)
+        stops.append((min(max(position, 0.0), 1.0), hex_to_rgb(parts[0])))
+    stops.sort(key=lambda stop: stop[0])
+    return stops
+
+def gradient_positions(width, height, gradient_type, angles):
+    """
+    一次性计算整张图（及整个批次）的渐变位置 t，返回 (B, H, W)，B 为角度个数。
+    Linear：沿角度方向投影；Radial：到中心的距离；Conic：绕中心的角度，从给定角度开始。
+    """
+    import torch
+
+    angles = torch.tensor(angles, dtype=torch.float32).view(-1, 1, 1)
+    radians = torch.deg2rad(angles)
+    dy = (torch.arange(height, dtype=torch.float32) - height / 2).view(1, -1, 1)
+    dx = (torch.arange(width, dtype=torch.float32) - width / 2).view(1, 1, -1)
+    if gradient_type == "Radial":
+        radius = math.hypot(width, height) / 2
+        t = torch.sqrt(dx * dx + dy * dy) / radius
+        return t.expand(angles.shape[0], -1, -1)
+    if gradient_type == "Conic":
+        return torch.remainder((torch.atan2(dy, dx) - radians) / (2 * math.pi), 1.0)
+    # 与原实现一致：投影距离除以最长边，再平移到 0-1
+    t = dx * torch.cos(radians) + dy * torch.sin(radians)
+    return t.div_(max(width, height)).add_(0.5)
+
+def render_gradient(t, stops, extrapolate=False):
+    """
+    按渐变节点对位置 t (B, H, W) 做分段线性插值，返回 (B, H, W, 3) 的 0-1 浮点图像。
+    颜色写成 c0 + sum(w_i * (c_{i+1} - c_i))，每段只需一次逐像素运算；
+    长度为 0 的段（两个节点位置相同）是硬过渡，权重为阶跃函数。
+    超出首尾节点时保持首尾颜色；extrapolate 为 True 时与原实现的起始色/结束色渐变一致，
+    沿首尾两段线性外推，最后再裁剪颜色。
+    """
+    import torch
+
+    colors = torch.tensor([color for _, color in stops], dtype=torch.float32) / 255.0
+    output = colors[0].expand(*t.shape, 3).clone()
+    for index in range(len(stops) - 1):
+        start, end = stops[index][0], stops[index + 1][0]
+        if end <= start:
+            weight = (t >= start).float()
+        else:
+            weight = (t - start) / (end - start)
+            if index > 0 or not extrapolate:
+                weight.clamp_(min=0.0)
+            if index < len(stops) - 2 or not extrapolate:
+                weight.clamp_(max=1.0)
+        output.addcmul_(weight.unsqueeze(-1), colors[index + 1] - colors[index])
+    return output.clamp_(0.0, 1.0)
 
 class ImageColor:
     """
@@ -49,6 +130,26 @@ class ImageColor:
                     "step": 1.0,
                     "display": "number"
                 }),
+            },
+            "optional": {
+                "gradient_type": (["Linear", "Radial", "Conic"], {
+                    "default": "Linear"
+                }),
+                # 多色渐变节点，例如 "#000000 0, #FF0000 0.5, #FFFFFF 1"；为空时使用起始色和结束色
+                "gradient_stops": ("STRING", {
+                    "default": "",
+                    "display": "text"
+                }),
+                # 逐帧渐变角度（逗号分隔），为空时所有帧使用 gradient_angle
+                "gradient_angle_list": ("STRING", {"default": ""}),
+                # 输出批次大小：所有帧相同时以共享内存的视图返回
+                "batch_size": ("INT", {
+                    "default": 1,
+                    "min": 1,
+                    "max": 4096,
+                    "step": 1,
+                    "display": "number"
+                }),
             }
         }
 
@@ -58,59 +159,45 @@ class ImageColor:
     CATEGORY = "💀S4Tool"
     OUTPUT_NODE = False
 
-    def generate_image(self, width, height, color_hex, gradient_enabled, 
-                      gradient_start_hex, gradient_end_hex, gradient_angle):
-        from PIL import Image
-        import colorsys
-        import numpy as np
-
-        # 解析 HEX 颜色为 RGB（无透明度，固定为不透明）
-        def hex_to_rgb(hex_color):
-            hex_color = hex_color.lstrip('#')
-            if len(hex_color) == 3:
-                hex_color = ''.join(c * 2 for c in hex_color)
-            r = int(hex_color[0:2], 16)
-            g = int(hex_color[2:4], 16)
-            b = int(hex_color[4:6], 16)
-            return (r, g, b)
-
-        # 单一颜色生成
+    def generate_image(self, width, height, color_hex, gradient_enabled,
+                      gradient_start_hex, gradient_end_hex, gradient_angle,
+                      gradient_type="Linear", gradient_stops="", gradient_angle_list="", batch_size=1):
+        import torch
+
+        # 缓存键使用解析后的参数，写法不同但结果相同的颜色（如 #FFF 与 #ffffff）共用同一条目
         if not gradient_enabled:
-            color = hex_to_rgb(color_hex)
-            image = Image.new('RGB', (width, height), color=color)  # 使用 RGB 模式，强制不透明
+            rgb = hex_to_rgb(color_hex)
+            cache_key = (width, height, rgb)
         else:
-            # 渐变颜色生成
-            start_color = hex_to_rgb(gradient_start_hex)
-            end_color = hex_to_rgb(gradient_end_hex)
-
-            # 创建渐变图像
-            image = Image.new('RGB', (width, height))
-            pixels = image.load()
-
-            for x in range(width):
-                for y in range(height):
-                    # 计算渐变比例（基于角度）
-                    angle_rad = np.radians(gradient_angle)
-                    dx = x - width / 2
-                    dy = y - height / 2
-                    dist = (dx * np.cos(angle_rad) + dy * np.sin(angle_rad)) / max(width, height)
-                    t = (dist + 0.5)  # 归一化到 0-1
-
-                    # 插值计算颜色
-                    r = start_color[0] + t * (end_color[0] - start_color[0])
-                    g = start_color[1] + t * (end_color[1] - start_color[1])
-                    b = start_color[2] + t * (end_color[2] - start_color[2])
-
-                    # 裁剪到有效范围
-                    r = np.clip(r, 0, 255)
-                    g = np.clip(g, 0, 255)
-                    b = np.clip(b, 0, 255)
-
-                    pixels[x, y] = (int(r), int(g), int(b))
-
-        # 调试信息
-        print(f"Generated image size: {image.size}, mode: {image.mode}")
-
-        # 转换为张量输出（RGB 格式）
-        output_tensor = pil2tensor(image)
-        return (output_tensor,)
\ No newline at end of file
+            stops = parse_gradient_stops(gradient_stops, gradient_start_hex, gradient_end_hex)
+            # 只有未填写 gradient_stops 的起始色/结束色渐变沿用原实现的外推
+            extrapolate = not (gradient_stops or "").strip()
+            angles = _frame_values(gradient_angle_list, gradient_angle, float)
+            # 多个角度时每个角度一帧，批次大小必须为 1 或与角度个数一致
+            batch_size = len(_expand_to_batch(angles, len(angles) if batch_size == 1 else batch_size,
+                                              "gradient_angle_list"))
+            if gradient_type == "Radial" or len(set(angles)) == 1:
+                angles = angles[:1]  # 径向渐变与角度无关，角度相同的帧只生成一次
+            cache_key = (width, height, gradient_type, tuple(angles), tuple(stops), extrapolate)
+
+        frame = _generated_cache.get(cache_key)
+        if frame is None:
+            with stage("ImageColor", "generate"):
+                # 单一颜色生成
+                if not gradient_enabled:
+                    color = torch.tensor(rgb, dtype=torch.float32) / 255.0
+                    frame = color.expand(1, height, width, 3).clone()
+                else:
+                    # 渐变颜色生成：整张图一次性向量化计算
+                    t = gradient_positions(width, height, gradient_type, angles)
+                    frame = render_gradient(t, stops, extrapolate)
+            _generated_cache.put(cache_key, frame)
+
+        # 只有一帧时批次中的帧完全相同：返回共享同一帧内存的广播视图，不按帧分配
+        output_tensor = frame if frame.shape[0] == batch_size else frame.expand(batch_size, -1, -1, -1)
+
+        if debug_enabled():
+            logger.debug("ImageColor: generated %s, gradient: %s", tuple(output_tensor.shape),
+                         gradient_type if gradient_enabled else "None")
+
+        return (output_tensor,)
@@ -0,0 +1,96 @@
+# PIL 图像与 ComfyUI 张量之间的转换。布局是显式的：IMAGE 为 (B, H, W, C)，MASK 为 (B, H, W)，
+# 不再根据形状猜测通道位置。转换尽量共享缓冲区（torch.from_numpy / Image.fromarray）并使用原地运算，
+# 需要保持 8 位的节点可以传入 dtype=torch.uint8 走不扩展到浮点的快速路径。
+import numpy as np
+import torch
+from PIL import Image
+
+IMAGE = "IMAGE"
+MASK = "MASK"
+
+# 张量通道数对应的 PIL 模式
+_MODES = {1: "L", 3: "RGB", 4: "RGBA"}
+
+def _pil_array(image):
+    # np.array 复制一次得到可写数组，之后 torch.from_numpy 与之共享内存
+    if image.mode not in ("L", "RGB", "RGBA"):
+        image = image.convert("RGBA")
+    return np.array(image)
+
+def pil_to_tensor(image, layout=IMAGE, dtype=torch.float32):
+    """
+    将单张 PIL 图像转换为 (1, H, W, C) 的 IMAGE 或 (1, H, W) 的 MASK。
+    dtype 为 torch.uint8 时直接返回与解码数组共享内存的张量；否则只分配一次浮点张量并原地归一化。
+    """
+    if layout == MASK and image.mode != "L":
+        image = image.convert("L")
+    tensor = torch.from_numpy(_pil_array(image))
+    if layout == IMAGE and tensor.dim() == 2:
+        tensor = tensor.unsqueeze(-1)
+    tensor = tensor.unsqueeze(0)
+    if dtype == torch.uint8:
+        return tensor
+    return tensor.to(dtype).div_(255.0)
+
+def pil_batch_to_tensor(images, layout=IMAGE, dtype=torch.float32):
+    """
+    将尺寸相同的多张 PIL 图像写入预先分配的批次张量，每帧只复制一次。
+    """
+    images = list(images)
+    if not images:
+        raise ValueError("No images to convert")
+    first = pil_to_tensor(images[0], layout, torch.uint8)
+    output = torch.empty((len(images),) + tuple(first.shape[1:]), dtype=dtype)
+    for index, image in enumerate(images):
+        frame = first if index == 0 else pil_to_tensor(image, layout, torch.uint8)
+        if frame.shape[1:] != output.shape[1:]:
+            raise ValueError(f"Frame {index} has shape {tuple(frame.shape[1:])}, expected {tuple(output.shape[1:])}")
+        output[index].copy_(frame[0])
+    if dtype != torch.uint8:
+        output.div_(255.0)
+    return output
+
+def to_uint8(tensor):
+    """
+    将 0-1 浮点张量转换为 uint8（与原实现一致：乘 255 后截断）；uint8 张量原样返回。
+    """
+    if tensor.dtype == torch.uint8:
+        return tensor
+    return tensor.detach().to("cpu", torch.float32).mul(255.0).clamp_(0.0, 255.0).to(torch.uint8)
+
+def tensor_to_pil(tensor, layout=IMAGE, index=0):
+    """
+    将 IMAGE (B, H, W, C) / (H, W, C) 或 MASK (B, H, W) / (H, W) 中的一帧转换为 PIL 图像。
+    """
+    expected = 4 if layout == IMAGE else 3
+    if tensor.dim() == expected - 1:
+        tensor = tensor.unsqueeze(0)
+    if tensor.dim() != expected:
+        raise ValueError(f"Unexpected {layout} tensor shape: {tuple(tensor.shape)}")
+    frame = tensor[index]
+    if layout == MASK:
+        frame = frame.unsqueeze(-1)
+    channels = frame.shape[-1]
+    if channels not in _MODES:
+        raise ValueError(f"Unexpected number of channels: {channels} with shape {tuple(tensor.shape)}")
+    array = to_uint8(frame).contiguous().numpy()
+    if channels == 1:
+        array = array[..., 0]
+    return Image.fromarray(array, mode=_MODES[channels])
+
+def tensor_to_pil_batch(tensor, layout=IMAGE):
+    """
+    将整个批次转换为 PIL 图像列表；先整体转换为 uint8，再逐帧共享缓冲区创建图像。
+    """
+    expected = 4 if layout == IMAGE else 3
+    if tensor.dim() == expected - 1:
+        tensor = tensor.unsqueeze(0)
+    batch = to_uint8(tensor).contiguous()
+    return [tensor_to_pil(batch, layout, index) for index in range(batch.shape[0])]
+
+# 兼容旧接口：pil2tensor（张量转 PIL 需要明确布局，请使用 tensor_to_pil）
+def pil2tensor(image):
+    # 确保图像是 RGB 或 RGBA 格式
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA")
+    return pil_to_tensor(image, IMAGE)
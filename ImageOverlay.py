@@ -1,64 +1,110 @@
-# 辅助函数定义（共享给其他文件使用）
+from .Instrumentation import logger, debug_enabled, stage
+
+# 支持的图层混合模式（实现见 Compositor._BLEND_KERNELS）
+BLEND_MODES = ["Normal", "Multiply", "Screen", "Overlay", "Add", "Soft Light", "Darken", "Lighten"]
+
+# 缩放/旋转使用的重采样滤波器
+RESAMPLE_FILTERS = ["Bicubic", "Bilinear", "Nearest"]
+
+# 辅助函数定义（共享给其他文件使用）：实现位于 ImageConvert，执行时才导入
 def pil2tensor(image):
-    from PIL import Image
-    import torch
-    import numpy as np
-    # 确保图像是 RGB 或 RGBA 格式
-    if image.mode not in ['RGB', 'RGBA']:
-        image = image.convert('RGBA')
-    array = np.array(image).astype(np.float32) / 255.0
-    print(f"pil2tensor array shape: {array.shape}, min: {array.min()}, max: {array.max()}")  # 调试
-    return torch.from_numpy(array).unsqueeze(0)
-
-def tensor2pil(image):
-    from PIL import Image
-    import torch
-    import numpy as np
-    
-    # 确保是 PyTorch 张量
-    if not isinstance(image, torch.Tensor):
-        raise ValueError(f"Input must be a PyTorch tensor, got {type(image)} with shape {image.shape}")
-    
-    # 移除批次维度（如果存在）
-    if image.dim() == 4:  # (batch, channels, height, width)
-        if image.size(0) > 1:
-            print(f"Warning: Multiple batches detected, using first batch. Shape: {image.shape}")
-        image = image[0]  # 提取第一个批次
-    elif image.dim() == 3:  # (channels, height, width) 或 (height, width, channels)
-        image = image
-    else:
-        raise ValueError(f"Unexpected tensor dimension: {image.dim()} with shape {image.shape}")
-
-    # 转换为 numpy 数组，并缩放到 0-255
-    array = image.cpu().numpy()
-    print(f"tensor2pil array shape before transpose: {array.shape}, min: {array.min()}, max: {array.max()}")  # 调试
-
-    # 调整维度顺序，确保 (channels, height, width)
-    if array.ndim == 3 and array.shape[0] not in [1, 3, 4]:  # (height, width, channels)
-        array = np.transpose(array, (2, 0, 1))  # 转换为 (channels, height, width)
-    elif array.ndim == 2:  # (height, width)，可能是单通道
-        array = array[np.newaxis, :, :]  # 转换为 (1, height, width)
-    elif array.ndim != 3:
-        raise ValueError(f"Unexpected array shape: {array.shape}")
-
-    # 验证通道数
-    channels = array.shape[0]
-    if channels not in [1, 3, 4]:
-        raise ValueError(f"Unexpected number of channels: {channels} with shape {array.shape}")
-    
-    # 缩放到 0-255 范围
-    array = np.clip(array * 255.0, 0, 255)
-    print(f"tensor2pil array shape after transpose: {array.shape}, min: {array.min()}, max: {array.max()}")  # 调试
-
-    # 转换为 PIL 图像
-    if channels == 1:  # 单通道（如 MASK）
-        return Image.fromarray(array[0].astype(np.uint8), mode='L')
-    elif channels == 3:  # RGB
-        return Image.fromarray(np.transpose(array, (1, 2, 0)).astype(np.uint8), mode='RGB')
-    elif channels == 4:  # RGBA
-        return Image.fromarray(np.transpose(array, (1, 2, 0)).astype(np.uint8), mode='RGBA')
-    else:
-        raise ValueError(f"Unexpected number of channels: {channels} with shape {array.shape}")
+    from .ImageConvert import pil2tensor as convert
+    return convert(image)
+
+def _frame_values(list_value, scalar_value, cast):
+    """
+    解析逐帧参数：支持逗号分隔的字符串、列表/元组、张量或单个数值。
+    列表为空时回退到单值参数，返回值始终为列表。
+    """
+    for value in (list_value, scalar_value):
+        if value is None:
+            continue
+        if isinstance(value, str):
+            items = [item.strip() for item in value.replace("\n", ",").split(",") if item.strip()]
+            if not items:
+                continue
+            return [cast(float(item)) for item in items]
+        if hasattr(value, "tolist"):  # torch 张量或 numpy 数组
+            value = value.tolist()
+        if isinstance(value, (list, tuple)):
+            if not value:
+                continue
+            return [cast(item) for item in value]
+        return [cast(value)]
+    raise ValueError("Missing frame parameter value")
+
+def _expand_to_batch(values, batch_size, name):
+    # 单个值广播到所有帧，否则长度必须与批次一致
+    if len(values) == batch_size:
+        return values
+    if len(values) == 1:
+        return values * batch_size
+    raise ValueError(f"{name} has {len(values)} values, expected 1 or {batch_size}")
+
+def _check_batch(tensor, batch_size, name):
+    if tensor.shape[0] not in (1, batch_size):
+        raise ValueError(f"{name} has batch size {tensor.shape[0]}, expected 1 or {batch_size}")
+
+def read_layer_params(kwargs):
+    """
+    从节点参数中读取一个图层的设置，统一为批次格式（IMAGE 为 (B, H, W, C)，MASK 为 (B, H, W)），
+    逐帧参数以列表返回（列表输入优先，否则使用单值），尚未广播到输出批次。
+    """
+    layer_image = kwargs.get("Layer image")
+    layer_mask = kwargs.get("Layer mask (optional)")
+    if layer_image.dim() == 3:
+        layer_image = layer_image.unsqueeze(0)
+    if layer_mask is not None and layer_mask.dim() == 2:
+        layer_mask = layer_mask.unsqueeze(0)
+    return {
+        "image": layer_image,
+        "mask": layer_mask,
+        "mirror": kwargs.get("mirror", "None"),
+        "x": _frame_values(kwargs.get("x_position_list"), kwargs.get("x_position", 0), int),
+        "y": _frame_values(kwargs.get("y_position_list"), kwargs.get("y_position", 0), int),
+        "rotation": _frame_values(kwargs.get("rotation_list"), kwargs.get("rotation", 0.0), float),
+        "scale": _frame_values(kwargs.get("scale_list"), kwargs.get("scale", 1.0), float),
+        "opacity": float(kwargs.get("opacity", 1.0)),
+        "blend_mode": kwargs.get("blend_mode", "Normal"),
+        "resample": kwargs.get("resample", "Bicubic"),
+    }
+
+def layer_batch_size(layer):
+    # 图层自身需要的批次大小：图片、掩码和逐帧参数中的最大值
+    sizes = [layer["image"].shape[0], len(layer["x"]), len(layer["y"]), len(layer["rotation"]), len(layer["scale"])]
+    if layer["mask"] is not None:
+        sizes.append(layer["mask"].shape[0])
+    return max(sizes)
+
+def place_layer(layer, batch_size, node, workers=None):
+    """
+    将图层广播到输出批次并完成变换，返回 Compositor.composite_stack 所需的
+    (groups, xs, ys, opacity, blend_mode)。
+    """
+    from . import Compositor
+
+    xs = _expand_to_batch(layer["x"], batch_size, "x_position")
+    ys = _expand_to_batch(layer["y"], batch_size, "y_position")
+    rotations = _expand_to_batch(layer["rotation"], batch_size, "rotation")
+    scales = _expand_to_batch(layer["scale"], batch_size, "scale")
+    _check_batch(layer["image"], batch_size, "Layer image")
+    if layer["mask"] is not None:
+        _check_batch(layer["mask"], batch_size, "Layer mask")
+
+    # 同一图层以相同参数重复放置时直接复用缓存的变换结果
+    params = (tuple(scales), layer["mirror"], tuple(rotations), layer["resample"])
+    groups = Compositor.lookup_transform(layer["image"], layer["mask"], params)
+    if groups is None:
+        # 图层与掩码合并为 RGBA
+        with stage(node, "decode"):
+            layer_rgba = Compositor.layer_to_rgba(layer["image"], layer["mask"])
+
+        # 变换图层：缩放、镜像和旋转合并为一次重采样，相同缩放的帧批量处理
+        with stage(node, "transform"):
+            groups = Compositor.transform_layers(layer_rgba, scales, layer["mirror"], rotations, workers,
+                                                 layer["resample"])
+        Compositor.store_transform(layer["image"], layer["mask"], params, groups)
+    return (groups, xs, ys, layer["opacity"], layer["blend_mode"])
 
 # ImageOverlay 类
 class ImageOverlay:
@@ -77,15 +123,15 @@ class ImageOverlay:
                 "Background image": ("IMAGE",),  # 背景图片
                 "x_position": ("INT", {
                     "default": 0,
-                    "min": -4096,
-                    "max": 4096,
+                    "min": -16384,
+                    "max": 16384,
                     "step": 1,
                     "display": "number"
                 }),
                 "y_position": ("INT", {
                     "default": 0,
-                    "min": -4096,
-                    "max": 4096,
+                    "min": -16384,
+                    "max": 16384,
                     "step": 1,
                     "display": "number"
                 }),
@@ -109,6 +155,45 @@ class ImageOverlay:
             },
             "optional": {
                 "Layer mask (optional)": ("MASK",),  # 可选的掩码输入
+                "opacity": ("FLOAT", {
+                    "default": 1.0,
+                    "min": 0.0,
+                    "max": 1.0,
+                    "step": 0.01,
+                    "display": "number"
+                }),
+                "blend_mode": (BLEND_MODES, {
+                    "default": "Normal"
+                }),
+                # 逐帧参数（逗号分隔），为空时使用上面的单值
+                "x_position_list": ("STRING", {"default": ""}),
+                "y_position_list": ("STRING", {"default": ""}),
+                "rotation_list": ("STRING", {"default": ""}),
+                "scale_list": ("STRING", {"default": ""}),
+                # 缩放和旋转的重采样滤波器
+                "resample": (RESAMPLE_FILTERS, {
+                    "default": "Bicubic"
+                }),
+                # 分块合成的块大小（像素），0 为关闭；超大画布可降低峰值内存
+                "tile_size": ("INT", {
+                    "default": 0,
+                    "min": 0,
+                    "max": 16384,
+                    "step": 64,
+                    "display": "number"
+                }),
+                # 并行线程数，0 为自动（S4TOOL_WORKERS，或 CPU 核心数 // torch 线程数）
+                "workers": ("INT", {
+                    "default": 0,
+                    "min": 0,
+                    "max": 256,
+                    "step": 1,
+                    "display": "number"
+                }),
+                # 输出 RGBA（直通 alpha，浮点），背景的 alpha 参与合成，便于后续节点继续叠加
+                "output_alpha": ("BOOLEAN", {
+                    "default": False
+                }),
             }
         }
 
@@ -119,110 +204,31 @@ class ImageOverlay:
     OUTPUT_NODE = False
 
     def blend_images(self, **kwargs):
-        import torch
-        import numpy as np
-        from PIL import Image
+        from . import Compositor
 
         # 提取参数
-        Layer_image = kwargs.get("Layer image")
         Background_image = kwargs.get("Background image")
-        x_position = kwargs.get("x_position", 0)
-        y_position = kwargs.get("y_position", 0)
-        mirror = kwargs.get("mirror", "None")
-        rotation = kwargs.get("rotation", 0.0)
-        scale = kwargs.get("scale", 1.0)
-        Layer_mask = kwargs.get("Layer mask (optional)")
-
-        # 调试：打印原始张量形状
-        print(f"Layer image tensor shape: {Layer_image.shape}")
-        print(f"Background image tensor shape: {Background_image.shape}")
-
-        # 转换为 PIL 图像，确保 RGBA 模式以支持透明度
-        background_pil = tensor2pil(Background_image).convert('RGBA')
-        layer_pil = tensor2pil(Layer_image).convert('RGBA')  # 强制转换为 RGBA 模式
-
-        # 调试：检查 layer_pil 的像素值
-        layer_array = np.array(layer_pil)
-        print(f"Layer PIL pixel values: shape: {layer_array.shape}, min: {layer_array.min()/255}, max: {layer_array.max()/255}")
-
-        # 提取 Layer image 的 alpha 通道作为默认掩码
-        layer_alpha = layer_pil.split()[-1]
-        print(f"Layer alpha size: {layer_alpha.size}, mode: {layer_alpha.mode}, min: {np.array(layer_alpha).min()/255}, max: {np.array(layer_alpha).max()/255}")  # 调试
-
-        # 处理可选掩码（如果提供）
-        if Layer_mask is not None:
-            mask_pil = tensor2pil(Layer_mask).convert('L')
-            mask_array = np.array(mask_pil)
-            print(f"Layer mask tensor shape: {Layer_mask.shape}")
-            print(f"Layer mask PIL size: {mask_pil.size}, mode: {mask_pil.mode}, min: {mask_array.min()/255}, max: {mask_array.max()/255}")
-            if mask_pil.size != layer_pil.size:
-                print(f"Resizing mask from {mask_pil.size} to {layer_pil.size}")
-                mask_pil = mask_pil.resize(layer_pil.size, Image.Resampling.LANCZOS)
-            # 确保掩码逻辑正确（黑色为透明，白色为不透明）
-            if mask_array.max() <= 1.0:  # 假设 mask 已归一化
-                mask_array = mask_array * 255
-            if mask_array.max() == 255 and mask_array.min() == 0:
-                layer_alpha = Image.fromarray(255 - mask_array.astype(np.uint8), mode='L')  # 反转掩码
-            else:
-                layer_alpha = Image.fromarray(mask_array.astype(np.uint8), mode='L')
-
-        # 应用缩放
-        target_width = int(layer_pil.width * scale)
-        target_height = int(layer_pil.height * scale)
-        if target_width != layer_pil.width or target_height != layer_pil.height:
-            print(f"Scaling layer from {layer_pil.size} to ({target_width}, {target_height})")
-            layer_pil = layer_pil.resize((target_width, target_height), Image.Resampling.LANCZOS)
-            layer_alpha = layer_alpha.resize((target_width, target_height), Image.Resampling.LANCZOS)
-
-        # 应用镜像
-        if mirror == "Horizontal":
-            layer_pil = layer_pil.transpose(Image.FLIP_LEFT_RIGHT)
-            layer_alpha = layer_alpha.transpose(Image.FLIP_LEFT_RIGHT)
-        elif mirror == "Vertical":
-            layer_pil = layer_pil.transpose(Image.FLIP_TOP_BOTTOM)
-            layer_alpha = layer_alpha.transpose(Image.FLIP_TOP_BOTTOM)
-
-        # 应用旋转
-        if rotation != 0:
-            layer_pil = layer_pil.rotate(rotation, expand=True)
-            layer_alpha = layer_alpha.rotate(rotation, expand=True)
-
-        # 计算粘贴位置，基于 Layer image 的调整后大小
-        x = x_position
-        y = y_position
-        original_height = Layer_image.shape[2]  # 原始高度
-        original_width = Layer_image.shape[3]   # 原始宽度
-        target_height = int(original_height * scale)  # 调整后高度
-        target_width = int(original_width * scale)    # 调整后宽度
-        paste_box = (x, y, x + target_width, y + target_height)
-        print(f"Initial Paste box: {paste_box}")  # 调试
-
-        # 确保粘贴区域在背景图像范围内
-        paste_box = (
-            max(0, x),
-            max(0, y),
-            min(background_pil.width, x + target_width),
-            min(background_pil.height, y + target_height)
-        )
-        print(f"Adjusted paste box: {paste_box}")  # 调试
-
-        # 创建中间画布，处理前景图像和掩码
-        comp = Image.new('RGBA', background_pil.size, (0, 0, 0, 0))  # 透明画布
-        comp.paste(layer_pil, (paste_box[0], paste_box[1]), layer_alpha)
-        comp_mask = Image.new('L', background_pil.size, 0)  # 黑色掩码
-        comp_mask.paste(layer_alpha, (paste_box[0], paste_box[1]))
-
-        # 验证 alpha 掩码有效性
-        alpha_array = np.array(comp_mask)
-        print(f"Comp mask values: min: {alpha_array.min()/255}, max: {alpha_array.max()/255}")
-        if alpha_array.max() == 0:
-            print("Warning: Comp mask is fully transparent, forcing default alpha")
-            comp_mask = Image.new('L', comp.size, 255)  # 全不透明掩码
-
-        # 将中间画布与背景混合
-        background_pil = Image.composite(comp, background_pil, comp_mask)
-        print(f"Background size after paste: {background_pil.size}, min: {np.array(background_pil.convert('RGB')).min()/255}, max: {np.array(background_pil.convert('RGB')).max()/255}")  # 调试
-
-        # 转换为张量，输出 RGB 格式
-        blended_image = pil2tensor(background_pil.convert('RGB'))
-        return (blended_image,)
\ No newline at end of file
+        if Background_image.dim() == 3:
+            Background_image = Background_image.unsqueeze(0)
+        layer = read_layer_params(kwargs)
+
+        # 计算输出批次大小：所有输入的批次必须为 1 或 B
+        batch_size = max(layer_batch_size(layer), Background_image.shape[0])
+        _check_batch(Background_image, batch_size, "Background image")
+
+        if debug_enabled():
+            logger.debug("ImageOverlay: layer %s, background %s, mask %s, output batch %d",
+                         tuple(layer["image"].shape), tuple(Background_image.shape),
+                         None if layer["mask"] is None else tuple(layer["mask"].shape), batch_size)
+
+        Compositor.configure_threads()
+        workers = kwargs.get("workers", 0)
+        placement = place_layer(layer, batch_size, "ImageOverlay", workers)
+
+        # 背景只使用 RGB（输出 RGBA 时也使用其 alpha），一次性对整个批次进行混合
+        output_alpha = kwargs.get("output_alpha", False)
+        with stage("ImageOverlay", "composite"):
+            blended_image = Compositor.composite_stack(Background_image, [placement], batch_size,
+                                                       tile_size=kwargs.get("tile_size", 0), workers=workers,
+                                                       with_alpha=output_alpha)
+        return (blended_image,)
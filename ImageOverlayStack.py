@@ -0,0 +1,118 @@
+from .ImageOverlay import ImageOverlay, BLEND_MODES, read_layer_params, layer_batch_size, place_layer, _check_batch
+from .Instrumentation import logger, debug_enabled, stage
+
+# 图层列表类型：由 ImageOverlayLayer 逐个追加，交给 ImageOverlayStack 一次性合成
+LAYERS_TYPE = "OVERLAY_LAYERS"
+
+class ImageOverlayLayer:
+    """
+    一个定义叠加图层的节点：设置图层的位置、镜像、旋转、缩放、不透明度和混合模式，
+    并追加到图层列表中。多个节点串联后交给 Image Overlay Stack 一次性合成。
+    """
+    def __init__(self):
+        pass
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        # 复用 ImageOverlay 的图层参数定义，去掉背景和输出设置；不透明度和混合模式改为必填
+        inputs = ImageOverlay.INPUT_TYPES()
+        required = {name: spec for name, spec in inputs["required"].items() if name != "Background image"}
+        required["opacity"] = ("FLOAT", {
+            "default": 1.0,
+            "min": 0.0,
+            "max": 1.0,
+            "step": 0.01,
+            "display": "number"
+        })
+        required["blend_mode"] = (BLEND_MODES, {
+            "default": "Normal"
+        })
+        excluded = ("tile_size", "workers", "output_alpha", "opacity", "blend_mode")
+        optional = {name: spec for name, spec in inputs["optional"].items() if name not in excluded}
+        optional["Layers (optional)"] = (LAYERS_TYPE,)  # 上一个图层节点的输出
+        return {"required": required, "optional": optional}
+
+    RETURN_TYPES = (LAYERS_TYPE,)
+    RETURN_NAMES = ("layers",)
+    FUNCTION = "add_layer"
+    CATEGORY = "💀S4Tool"
+    OUTPUT_NODE = False
+
+    def add_layer(self, **kwargs):
+        # 返回新列表，不修改上游节点的输出
+        layers = list(kwargs.get("Layers (optional)") or [])
+        layers.append(read_layer_params(kwargs))
+        return (layers,)
+
+class ImageOverlayStack:
+    """
+    一个将多个图层按顺序（自底向上）合成到背景上的节点。
+    所有图层共用同一个累加器，背景只复制一次，输出只转换一次，避免串联多个 Image Overlay 的重复开销。
+    """
+    def __init__(self):
+        pass
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "Background image": ("IMAGE",),  # 背景图片
+                "layers": (LAYERS_TYPE,),
+            },
+            "optional": {
+                # 分块合成的块大小（像素），0 为关闭；超大画布可降低峰值内存
+                "tile_size": ("INT", {
+                    "default": 0,
+                    "min": 0,
+                    "max": 16384,
+                    "step": 64,
+                    "display": "number"
+                }),
+                # 并行线程数，0 为自动（S4TOOL_WORKERS，或 CPU 核心数 // torch 线程数）
+                "workers": ("INT", {
+                    "default": 0,
+                    "min": 0,
+                    "max": 256,
+                    "step": 1,
+                    "display": "number"
+                }),
+                # 输出 RGBA（直通 alpha，浮点），背景的 alpha 参与合成，便于后续节点继续叠加
+                "output_alpha": ("BOOLEAN", {
+                    "default": False
+                }),
+            }
+        }
+
+    RETURN_TYPES = ("IMAGE",)
+    RETURN_NAMES = ("blended_image",)
+    FUNCTION = "stack_layers"
+    CATEGORY = "💀S4Tool"
+    OUTPUT_NODE = False
+
+    def stack_layers(self, **kwargs):
+        from . import Compositor
+
+        Background_image = kwargs.get("Background image")
+        if Background_image.dim() == 3:
+            Background_image = Background_image.unsqueeze(0)
+        layers = kwargs.get("layers") or []
+
+        # 输出批次大小：背景和所有图层的最大值，其余输入必须为 1 或 B
+        batch_size = max([Background_image.shape[0]] + [layer_batch_size(layer) for layer in layers])
+        _check_batch(Background_image, batch_size, "Background image")
+
+        if debug_enabled():
+            logger.debug("ImageOverlayStack: %d layers, background %s, output batch %d",
+                         len(layers), tuple(Background_image.shape), batch_size)
+
+        Compositor.configure_threads()
+        workers = kwargs.get("workers", 0)
+        placements = [place_layer(layer, batch_size, "ImageOverlayStack", workers) for layer in layers]
+
+        # 所有图层依次混合到同一个累加器（输出 RGBA 时按分块转为预乘 alpha）
+        output_alpha = kwargs.get("output_alpha", False)
+        with stage("ImageOverlayStack", "composite"):
+            blended_image = Compositor.composite_stack(Background_image, placements, batch_size,
+                                                       tile_size=kwargs.get("tile_size", 0), workers=workers,
+                                                       with_alpha=output_alpha)
+        return (blended_image,)
@@ -1,36 +1,181 @@
-from .ImageOverlay import pil2tensor  # 导入共享的辅助函数
+import os
+
+from .Instrumentation import logger, debug_enabled, stage
+from .TensorCache import TensorCache, budget_from_env
+
+# 支持的图片格式
+SUPPORTED_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp", ".gif")
+
+# images 目录索引：目录 mtime 不变时直接复用上次扫描结果
+_index = {"mtime": None, "names": []}
+
+# 已解码图片的 LRU 缓存，内存预算由 S4TOOL_SELECTOR_CACHE_MB 配置（默认 512MB，0 为禁用）
+_decoded_cache = TensorCache(budget_from_env("S4TOOL_SELECTOR_CACHE_MB", 512))
+
+def get_images_dir():
+    # 获取当前文件的目录（插件目录）下的 images 子目录
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(current_dir, "images")
+
+def get_store_dir():
+    """
+    预处理资源目录（与 images 同级）：每张图片转换为 float32 的 IMAGE / MASK .npy 文件，
+    之后以内存映射方式加载，免去解码，且多个进程共享同一份页面缓存。
+    设置环境变量 S4TOOL_ASSET_STORE=0 时禁用，返回 None。
+    """
+    if os.environ.get("S4TOOL_ASSET_STORE", "").strip() == "0":
+        return None
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(current_dir, "image_cache")
+
+def _stamp(stat):
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+def store_paths(image_file, stat, frames=(0, 0, 1)):
+    # 文件名包含源文件的 mtime 和大小（源文件修改后自动对应新的条目）以及帧范围
+    start, count, step = frames
+    stem = os.path.join(get_store_dir(), f"{image_file}.{_stamp(stat)}.f{start}-{count}-{step}")
+    return stem + ".image.npy", stem + ".mask.npy"
+
+def remove_stale(image_file, stat=None):
+    # 删除同一源文件的旧版本条目；stat 为 None 时删除该文件的所有条目
+    store_dir = get_store_dir()
+    if store_dir is None or not os.path.isdir(store_dir):
+        return
+    current = None if stat is None else _stamp(stat)
+    with os.scandir(store_dir) as entries:
+        for entry in entries:
+            if not entry.name.endswith(".npy"):
+                continue
+            name, stamp = entry.name.rsplit(".", 4)[:2]
+            if name == image_file and stamp != current:
+                os.remove(entry.path)
+
+def _load_store(paths):
+    import numpy as np
+    import torch
+
+    # mmap_mode="c"（写时复制）：页面在进程间共享，下游节点即使原地修改也不会写回文件
+    return tuple(torch.from_numpy(np.load(path, mmap_mode="c")) for path in paths)
+
+def _write_store(paths, tensors):
+    import numpy as np
+
+    os.makedirs(os.path.dirname(paths[0]), exist_ok=True)
+    for path, tensor in zip(paths, tensors):
+        # 先写临时文件再重命名，其他进程不会读到写了一半的文件
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as handle:
+            np.save(handle, tensor.numpy())
+        os.replace(temp_path, path)
+
+def frame_indices(total, frames):
+    """
+    按 (起始帧, 帧数, 步长) 选择帧，帧数为 0 时一直取到最后一帧。
+    """
+    start, count, step = frames
+    indices = range(start, total, max(1, step))
+    return indices[:count] if count > 0 else indices
+
+def iter_frames(image, indices):
+    # 逐帧解码为 RGBA，每次只保留一帧（GIF / WebP 动画的帧已合成为完整画布）
+    for index in indices:
+        image.seek(index)
+        yield image.convert('RGBA')
+
+def decode_image(image_path, frames=(0, 0, 1)):
+    """
+    解码图片（动画 GIF / WebP 解码所选范围内的所有帧），
+    返回 (IMAGE (B, H, W, 3), MASK (B, H, W)) 浮点张量，B 为帧数。
+    """
+    import torch
+    from PIL import Image
+    from .ImageConvert import IMAGE, pil_to_tensor
+
+    try:
+        image = Image.open(image_path)
+    except Exception as e:
+        raise ValueError(f"Failed to load image {image_path}: {str(e)}")
+
+    # 多帧图片在 seek 期间保持文件打开，解码结束（或出错）时关闭
+    with image:
+        indices = frame_indices(getattr(image, "n_frames", 1), frames)
+        if not indices:
+            raise ValueError(f"No frames selected from {image_path} ({getattr(image, 'n_frames', 1)} frames)")
+
+        # 输出张量预先分配，每帧解码后直接写入，不保留整段动画的中间结果
+        width, height = image.size
+        image_tensor = torch.empty((len(indices), height, width, 3), dtype=torch.float32)
+        mask_tensor = torch.empty((len(indices), height, width), dtype=torch.float32)
+        frame_iter = iter_frames(image, indices)
+        for position in range(len(indices)):
+            with stage("ImageSelector", "decode"):
+                frame = next(frame_iter)
+            with stage("ImageSelector", "encode"):
+                rgba_tensor = pil_to_tensor(frame, IMAGE, torch.uint8)[0]  # (H, W, 4)，与解码数组共享内存
+                image_tensor[position].copy_(rgba_tensor[..., :3])
+                mask_tensor[position].copy_(rgba_tensor[..., 3])
+
+    image_tensor.div_(255.0)
+    # 反转蒙版值：与 ComfyUI 官方 MASK 输出一致，黑色（不透明，值 0）对应 0，白色（透明，值 255）对应 1
+    mask_tensor.div_(-255.0).add_(1.0)
+    return image_tensor, mask_tensor
+
+def load_asset(image_file, image_path, stat, frames=(0, 0, 1)):
+    """
+    从资源目录加载图片；条目不存在或已损坏时解码源文件并写入资源目录（增量转换），
+    同时删除该图片的旧版本条目。资源目录不可用或不可写时直接返回解码结果。
+    """
+    if get_store_dir() is None:
+        return decode_image(image_path, frames)
+    paths = store_paths(image_file, stat, frames)
+    if all(os.path.exists(path) for path in paths):
+        try:
+            with stage("ImageSelector", "load"):
+                return _load_store(paths)
+        except (OSError, ValueError) as e:
+            logger.debug("ImageSelector: rebuilding asset store entry for %s: %s", image_file, e)
+
+    tensors = decode_image(image_path, frames)
+    try:
+        _write_store(paths, tensors)
+        remove_stale(image_file, stat)
+    except OSError as e:
+        logger.debug("ImageSelector: asset store not writable: %s", e)
+        return tensors
+    return _load_store(paths)
+
+def list_images():
+    """
+    返回 images 目录中支持的图片文件名（已排序）。
+    目录的 mtime 在增删、重命名文件时会变化，据此判断索引是否失效。
+    """
+    images_dir = get_images_dir()
+    try:
+        mtime = os.stat(images_dir).st_mtime_ns
+    except FileNotFoundError:
+        return []
+    if _index["mtime"] != mtime:
+        with os.scandir(images_dir) as entries:
+            names = [entry.name for entry in entries
+                     if entry.is_file() and entry.name.lower().endswith(SUPPORTED_EXTENSIONS)]
+        _index["names"] = sorted(names)
+        _index["mtime"] = mtime
+    return _index["names"]
 
 class ImageSelector:
     """
     一个从插件目录下 images 子目录中选择图片的节点，支持 png、jpg、jpeg、webp、gif 格式。
     提供 image（RGB）和 mask（单通道灰度图）输出，与 ComfyUI 官方 MASK 输出一致。
+    动画 GIF / WebP 输出所有帧组成的批次，可通过起始帧、帧数和步长限制范围。
     """
     def __init__(self):
         pass
 
     @classmethod
     def INPUT_TYPES(cls):
-        import os
-        import glob
-
-        # 获取当前文件的目录（插件目录）
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        images_dir = os.path.join(current_dir, "images")
-
-        # 如果 images 目录不存在，则创建
-        if not os.path.exists(images_dir):
-            os.makedirs(images_dir)
-
-        # 支持的图片格式
-        supported_extensions = ["*.png", "*.jpg", "*.jpeg", "*.webp", "*.gif"]
-        image_files = []
-
-        # 遍历所有支持的格式，获取图片文件
-        for ext in supported_extensions:
-            image_files.extend(glob.glob(os.path.join(images_dir, ext)))
-
-        # 提取文件名（不含路径）
-        image_names = [os.path.basename(f) for f in image_files]
+        # 注册时不创建目录也不重复扫描：list_images 只在目录 mtime 变化时重新扫描
+        image_names = list_images()
         if not image_names:  # 如果没有图片，添加占位符
             image_names = ["No images found"]
 
@@ -39,6 +184,30 @@ class ImageSelector:
                 "image_file": (image_names, {
                     "default": image_names[0] if image_names else "No images found"
                 }),
+            },
+            "optional": {
+                # 动画帧范围：起始帧、帧数（0 为全部）和步长，静态图片只有第 0 帧
+                "frame_start": ("INT", {
+                    "default": 0,
+                    "min": 0,
+                    "max": 100000,
+                    "step": 1,
+                    "display": "number"
+                }),
+                "frame_count": ("INT", {
+                    "default": 0,
+                    "min": 0,
+                    "max": 100000,
+                    "step": 1,
+                    "display": "number"
+                }),
+                "frame_step": ("INT", {
+                    "default": 1,
+                    "min": 1,
+                    "max": 1000,
+                    "step": 1,
+                    "display": "number"
+                }),
             }
         }
 
@@ -48,46 +217,37 @@ class ImageSelector:
     CATEGORY = "💀S4Tool"
     OUTPUT_NODE = False
 
-    def select_image(self, image_file):
-        import os
-        from PIL import Image
-        import torch
-        import numpy as np
+    @classmethod
+    def IS_CHANGED(cls, image_file, **kwargs):
+        # 文件被替换或修改时让 ComfyUI 重新执行节点
+        image_path = os.path.join(get_images_dir(), image_file)
+        try:
+            stat = os.stat(image_path)
+        except FileNotFoundError:
+            return ""
+        return f"{stat.st_mtime_ns}-{stat.st_size}"
 
-        # 获取插件目录下的 images 子目录
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        images_dir = os.path.join(current_dir, "images")
-        image_path = os.path.join(images_dir, image_file)
+    def select_image(self, image_file, frame_start=0, frame_count=0, frame_step=1):
+        image_path = os.path.join(get_images_dir(), image_file)
 
         # 检查文件是否存在
         if not os.path.exists(image_path):
             raise FileNotFoundError(f"Image file {image_path} not found!")
 
-        # 加载图片
-        try:
-            image = Image.open(image_path)
-        except Exception as e:
-            raise ValueError(f"Failed to load image {image_path}: {str(e)}")
-
-        # 转换为 RGBA 格式以支持 Alpha 通道
-        image = image.convert('RGBA')
-
-        # 提取 RGB 部分
-        image_rgb = image.convert('RGB')
+        # 命中缓存时直接返回已解码的张量（文件修改后 mtime/大小变化，缓存自动失效）
+        stat = os.stat(image_path)
+        frames = (frame_start, frame_count, frame_step)
+        cache_key = (image_path, stat.st_mtime_ns, stat.st_size, frames)
+        cached = _decoded_cache.get(cache_key)
+        if cached is not None:
+            return cached
 
-        # 提取 Alpha 通道作为蒙版
-        alpha_channel = image.split()[3]  # 获取 Alpha 通道
-        mask_array = np.array(alpha_channel).astype(np.float32) / 255.0  # 归一化到 0-1
-
-        # 反转蒙版值：与 ComfyUI 官方 MASK 输出一致，黑色（不透明，值 0）对应 0，白色（透明，值 255）对应 1
-        mask_array = 1.0 - mask_array  # 反转：0 变为 1，1 变为 0
-        mask_tensor = torch.from_numpy(mask_array).unsqueeze(0)  # (1, H, W)，与 ComfyUI 官方 MASK 格式一致
+        # 加载图片：优先使用资源目录中内存映射的预处理结果
+        image_tensor, mask_tensor = load_asset(image_file, image_path, stat, frames)
 
         # 调试信息
-        print(f"Selected image: {image_path}, size: {image.size}")
-        print(f"Mask tensor shape: {mask_tensor.shape}, min: {mask_tensor.min()}, max: {mask_tensor.max()}")
-
-        # 转换为张量输出（RGB 格式）
-        image_tensor = pil2tensor(image_rgb)
+        if debug_enabled():
+            logger.debug("ImageSelector: %s, size: %s, mask min: %s, max: %s", image_path, tuple(image_tensor.shape),
+                         mask_tensor.min().item(), mask_tensor.max().item())
 
-        return (image_tensor, mask_tensor)
\ No newline at end of file
+        return _decoded_cache.put(cache_key, (image_tensor, mask_tensor))
@@ -0,0 +1,65 @@
+# 基于 logging 的调试与计时工具，默认关闭。
+# 设置环境变量 S4TOOL_DEBUG=1（或将 "S4Tool" logger 调到 DEBUG 级别）后输出调试信息和各阶段耗时。
+# 关闭时 stage() 只做一次级别判断并返回共享的空上下文，不计时也不计算任何统计量。
+import logging
+import os
+import time
+
+logger = logging.getLogger("S4Tool")
+if os.environ.get("S4TOOL_DEBUG", "").strip() not in ("", "0"):
+    logger.setLevel(logging.DEBUG)
+
+# 阶段计时回调：fn(node, stage, seconds)，例如基准测试用来收集各阶段耗时
+_stage_hooks = []
+
+def debug_enabled():
+    """
+    是否需要输出调试信息。统计量（min/max 等）只应在返回 True 时计算。
+    """
+    return logger.isEnabledFor(logging.DEBUG)
+
+def add_stage_hook(hook):
+    _stage_hooks.append(hook)
+
+def remove_stage_hook(hook):
+    if hook in _stage_hooks:
+        _stage_hooks.remove(hook)
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+_NULL_STAGE = _NullStage()
+
+class _TimedStage:
+    __slots__ = ("node", "name", "start")
+
+    def __init__(self, node, name):
+        self.node = node
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        seconds = time.perf_counter() - self.start
+        logger.debug("%s: %s took %.3f ms", self.node, self.name, seconds * 1000.0)
+        for hook in _stage_hooks:
+            hook(self.node, self.name, seconds)
+        return False
+
+def stage(node, name):
+    """
+    计时上下文：with stage("ImageOverlay", "composite"): ...
+    常用阶段为 decode、transform、composite、encode。
+    """
+    if not _stage_hooks and not logger.isEnabledFor(logging.DEBUG):
+        return _NULL_STAGE
+    return _TimedStage(node, name)
@@ -0,0 +1,73 @@
+# 按内存预算淘汰的 LRU 张量缓存，供各节点缓存解码或变换结果。
+# 本模块不导入 torch，只通过鸭子类型统计张量占用的字节数。
+import os
+import threading
+from collections import OrderedDict
+
+def tensor_nbytes(value):
+    """
+    统计缓存值占用的字节数：支持单个张量/数组，以及由它们组成的元组、列表。
+    """
+    if isinstance(value, (tuple, list)):
+        return sum(tensor_nbytes(item) for item in value)
+    if hasattr(value, "element_size") and hasattr(value, "nelement"):  # torch 张量
+        return value.element_size() * value.nelement()
+    return getattr(value, "nbytes", 0)  # numpy 数组等
+
+class TensorCache:
+    """
+    线程安全的 LRU 缓存，超出 max_bytes 时从最久未使用的条目开始淘汰。
+    单个条目超过预算时不缓存；max_bytes 为 0 时禁用缓存。
+    """
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, value):
+        size = tensor_nbytes(value)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[1]
+            if size > self.max_bytes:
+                return value
+            self._entries[key] = (value, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+        return value
+
+    def pop(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return None
+            self.current_bytes -= entry[1]
+            return entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+def budget_from_env(name, default_mb):
+    """
+    从环境变量读取以 MB 为单位的缓存预算，返回字节数。
+    """
+    value = os.environ.get(name)
+    megabytes = float(value) if value else default_mb
+    return int(max(0.0, megabytes) * 1024 * 1024)
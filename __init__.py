@@ -1,17 +1,18 @@
-print("Loading ComfyUI-S4Tool nodes...")
-
-# 导入所有节点类
+# 导入所有节点类：节点模块只依赖标准库，torch / numpy / PIL 在节点首次执行时才导入
 from .ImageOverlay import ImageOverlay
 from .ImageBlendWithAlpha import ImageBlendWithAlpha
 from .ImageSelector import ImageSelector
 from .ImageColor import ImageColor
+from .ImageOverlayStack import ImageOverlayLayer, ImageOverlayStack
 
 # 节点映射
 NODE_CLASS_MAPPINGS = {
     "ImageOverlay": ImageOverlay,
     "ImageBlendWithAlpha": ImageBlendWithAlpha,
     "ImageSelector": ImageSelector,
-    "ImageColor": ImageColor  # 新增节点映射
+    "ImageColor": ImageColor,  # 新增节点映射
+    "ImageOverlayLayer": ImageOverlayLayer,
+    "ImageOverlayStack": ImageOverlayStack
 }
 
 # 节点显示名称
@@ -19,5 +20,7 @@ NODE_DISPLAY_NAME_MAPPINGS = {
     "ImageOverlay": "💀Image Overlay",
     "ImageBlendWithAlpha": "💀Image Blend with Alpha",
     "ImageSelector": "💀Image Selector",
-    "ImageColor": "💀Image Color"
+    "ImageColor": "💀Image Color",
+    "ImageOverlayLayer": "💀Image Overlay Layer",
+    "ImageOverlayStack": "💀Image Overlay Stack"
 }
\ No newline at end of file
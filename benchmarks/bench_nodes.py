@@ -0,0 +1,484 @@
+"""
+S4Tool 节点基准测试，无需启动 ComfyUI。
+
+直接加载插件包并调用各节点的 FUNCTION，覆盖不同分辨率、批次大小以及掩码/旋转/缩放等变体，
+报告耗时、峰值内存（RSS）和吞吐量，并可保存为 JSON 基线以便在提交之间比较。
+
+用法：
+    python benchmarks/bench_nodes.py                              # 运行全部用例
+    python benchmarks/bench_nodes.py --nodes ImageOverlay --sizes 1024 2048 --batches 1 8
+    python benchmarks/bench_nodes.py --output baseline.json       # 保存基线
+    python benchmarks/bench_nodes.py --compare baseline.json      # 与基线比较，回退超过阈值时返回非零
+    python benchmarks/bench_nodes.py --startup                    # 只测量注册耗时，导入重量级依赖或超时返回非零
+"""
+import argparse
+import gc
+import importlib.util
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE_NAME = "s4tool"
+
+DEFAULT_SIZES = [512, 1024, 2048, 4096]
+DEFAULT_BATCHES = [1, 8, 32]
+
+def load_package():
+    """
+    以包的形式加载插件目录（目录名含连字符，不能直接 import）。
+    """
+    if PACKAGE_NAME in sys.modules:
+        return sys.modules[PACKAGE_NAME]
+    spec = importlib.util.spec_from_file_location(
+        PACKAGE_NAME, os.path.join(PACKAGE_DIR, "__init__.py"), submodule_search_locations=[PACKAGE_DIR])
+    package = importlib.util.module_from_spec(spec)
+    sys.modules[PACKAGE_NAME] = package
+    spec.loader.exec_module(package)
+    return package
+
+def node_class(name):
+    return load_package().NODE_CLASS_MAPPINGS[name]
+
+def run_node(name, **kwargs):
+    cls = node_class(name)
+    return getattr(cls(), cls.FUNCTION)(**kwargs)
+
+def accepts_input(name, input_name):
+    inputs = node_class(name).INPUT_TYPES()
+    return any(input_name in inputs.get(section, {}) for section in ("required", "optional"))
+
+# ---------------------------------------------------------------------------
+# 内存统计
+# ---------------------------------------------------------------------------
+
+def reset_peak_rss():
+    # Linux 下写入 clear_refs 可以重置 VmHWM；其他平台只能报告进程级峰值
+    try:
+        with open("/proc/self/clear_refs", "w") as handle:
+            handle.write("5")
+        return True
+    except OSError:
+        return False
+
+def peak_rss_mb():
+    try:
+        with open("/proc/self/status") as handle:
+            for line in handle:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024.0 * 1024.0) if sys.platform == "darwin" else peak / 1024.0
+
+# ---------------------------------------------------------------------------
+# 用例定义：每个用例返回 (名称, 预估内存 MB, 处理像素数, 准备函数)
+# 准备函数返回一个无参的可调用对象，计时只包含该调用。
+# ---------------------------------------------------------------------------
+
+def _image(batch, height, width, channels=3):
+    import torch
+    generator = torch.Generator().manual_seed(0)
+    return torch.rand((batch, height, width, channels), generator=generator)
+
+def _mask(batch, height, width):
+    import torch
+    generator = torch.Generator().manual_seed(1)
+    return torch.rand((batch, height, width), generator=generator)
+
+def _frame_mb(batch, size, channels=3):
+    return batch * size * size * channels * 4 / (1024.0 * 1024.0)
+
+def overlay_cases(size, batch):
+    layer_size = max(16, size // 4)
+    variants = {
+        "plain": {},
+        "mask": {"mask": True},
+        "rotate_scale": {"rotation": 30.0, "scale": 1.5},
+    }
+    for variant, options in variants.items():
+        def setup(options=options):
+            kwargs = {
+                "Layer image": _image(1, layer_size, layer_size),
+                "Background image": _image(batch, size, size),
+                "x_position": size // 8,
+                "y_position": size // 8,
+                "mirror": "None",
+                "rotation": options.get("rotation", 0.0),
+                "scale": options.get("scale", 1.0),
+            }
+            if options.get("mask"):
+                kwargs["Layer mask (optional)"] = _mask(1, layer_size, layer_size)
+            return lambda: run_node("ImageOverlay", **kwargs)
+        yield f"ImageOverlay/{variant}", _frame_mb(batch, size) * 3, batch * size * size, setup
+
+def blend_mode_cases(size, batch):
+    # 每种混合模式一个用例：半透明掩码 + 不透明度，图层覆盖背景的一半
+    overlay = importlib.import_module(PACKAGE_NAME + ".ImageOverlay")
+    layer_size = max(16, size // 2)
+    for mode in overlay.BLEND_MODES:
+        def setup(mode=mode):
+            kwargs = {
+                "Layer image": _image(batch, layer_size, layer_size),
+                "Background image": _image(batch, size, size),
+                "Layer mask (optional)": _mask(1, layer_size, layer_size),
+                "x_position": size // 4,
+                "y_position": size // 4,
+                "mirror": "None",
+                "rotation": 0.0,
+                "scale": 1.0,
+                "opacity": 0.8,
+                "blend_mode": mode,
+            }
+            return lambda: run_node("ImageOverlay", **kwargs)
+        yield f"BlendMode/{mode.replace(' ', '')}", _frame_mb(batch, size) * 3, batch * size * size, setup
+
+def stack_cases(size, batch):
+    def setup():
+        layers = None
+        for index in range(5):
+            layer_size = max(16, size // (4 + index))
+            layers = run_node("ImageOverlayLayer", **{
+                "Layer image": _image(1, layer_size, layer_size),
+                "x_position": index * size // 8,
+                "y_position": index * size // 10,
+                "mirror": "None",
+                "rotation": 10.0 * index,
+                "scale": 1.0,
+                "opacity": 0.8,
+                "blend_mode": "Normal",
+                "Layers (optional)": layers,
+            })[0]
+        background = _image(batch, size, size)
+        return lambda: run_node("ImageOverlayStack", **{"Background image": background, "layers": layers})
+    yield "ImageOverlayStack/5_layers", _frame_mb(batch, size) * 3, batch * size * size, setup
+
+def blend_with_alpha_cases(size, batch):
+    variants = {"plain": size, "resized_mask": max(1, size // 2)}
+    for variant, mask_size in variants.items():
+        def setup(mask_size=mask_size):
+            image, alpha = _image(batch, size, size), _mask(batch, mask_size, mask_size)
+            return lambda: run_node("ImageBlendWithAlpha", image=image, alpha=alpha)
+        yield f"ImageBlendWithAlpha/{variant}", _frame_mb(batch, size, 4) * 4, batch * size * size, setup
+
+def color_cases(size, batch):
+    # 节点支持 batch_size 输入时测试批次，否则只测试批次 1
+    if batch > 1 and not accepts_input("ImageColor", "batch_size"):
+        return
+    # cold：每次清空生成缓存后重新生成；warm：命中缓存，只返回广播视图
+    variants = {"solid": False, "linear_gradient": True}
+    for variant, gradient in variants.items():
+        for cache in ("cold", "warm"):
+            def setup(gradient=gradient, cache=cache):
+                color = importlib.import_module(PACKAGE_NAME + ".ImageColor")
+                kwargs = dict(width=size, height=size, color_hex="#336699", gradient_enabled=gradient,
+                              gradient_start_hex="#000000", gradient_end_hex="#FFFFFF", gradient_angle=30.0)
+                if accepts_input("ImageColor", "batch_size"):
+                    kwargs["batch_size"] = batch
+
+                def call():
+                    if cache == "cold":
+                        color._generated_cache.clear()
+                    return run_node("ImageColor", **kwargs)
+                return call
+            yield f"ImageColor/{variant}/{cache}", _frame_mb(1, size) * 2, batch * size * size, setup
+
+def selector_cases(size, batch):
+    if batch > 1:
+        return
+    # decode：每次都重新解码并写入资源目录；cold：从资源目录内存映射；warm：命中内存缓存；
+    # animated：每次重新解码一个多帧 GIF
+    animated_frames = 8
+    for variant in ("decode", "cold", "warm", "animated"):
+        def setup(variant=variant):
+            from PIL import Image
+            import numpy as np
+            selector = importlib.import_module(PACKAGE_NAME + ".ImageSelector")
+            images_dir = selector.get_images_dir()
+            if not os.path.isdir(images_dir):
+                os.makedirs(images_dir)
+                _cleanup.append(images_dir)
+            name = f"_bench_{size}.gif" if variant == "animated" else f"_bench_{size}.png"
+            path = os.path.join(images_dir, name)
+            if not os.path.exists(path):
+                rng = np.random.default_rng(0)
+                if variant == "animated":
+                    frames = [Image.fromarray(rng.integers(0, 256, (size, size, 3), dtype=np.uint8), "RGB")
+                              for _ in range(animated_frames)]
+                    frames[0].save(path, save_all=True, append_images=frames[1:], duration=40, loop=0)
+                else:
+                    pixels = rng.integers(0, 256, (size, size, 4), dtype=np.uint8)
+                    Image.fromarray(pixels, "RGBA").save(path)
+                _cleanup.append(path)
+            store_dir = selector.get_store_dir()
+            if store_dir is not None:
+                if not os.path.isdir(store_dir):
+                    _cleanup.append(store_dir)
+                _cleanup.extend(selector.store_paths(name, os.stat(path)))
+
+            def call():
+                if variant != "warm":
+                    selector._decoded_cache.clear()
+                if variant in ("decode", "animated"):
+                    selector.remove_stale(name)
+                return run_node("ImageSelector", image_file=name)
+            return call
+        frames = animated_frames if variant == "animated" else 1
+        yield f"ImageSelector/{variant}", _frame_mb(frames, size, 4) * 3, frames * size * size, setup
+
+def _worker_counts():
+    counts, workers = [], 1
+    while workers < (os.cpu_count() or 1):
+        counts.append(workers)
+        workers *= 2
+    return counts + [os.cpu_count() or 1]
+
+def parallel_cases(size, batch):
+    # 同一工作负载在不同线程数下运行，用于观察并行扩展性（main 会输出相对单线程的加速比）。
+    # 每个用例把 torch 线程数设为 CPU 核心数 // 工作线程数，总线程数不超过核心数：
+    # w1 即只靠 torch 自身的并行，加速比反映按帧/分块并行相对它的收益
+    layer_size = max(16, size // 4)
+    rotations = ",".join(str(5 * i) for i in range(batch))
+    for mode, tile_size in (("frames", 0), ("tiles", max(64, size // 4))):
+        for workers in _worker_counts():
+            def setup(tile_size=tile_size, workers=workers):
+                kwargs = {
+                    "Layer image": _image(1, layer_size, layer_size),
+                    "Background image": _image(batch, size, size),
+                    "x_position": size // 8,
+                    "y_position": size // 8,
+                    "mirror": "None",
+                    "rotation": 0.0,
+                    "scale": 1.0,
+                    "rotation_list": rotations,
+                    "tile_size": tile_size,
+                    "workers": workers,
+                }
+                threads = max(1, (os.cpu_count() or 1) // workers)
+
+                def call():
+                    import torch
+                    previous = torch.get_num_threads()
+                    torch.set_num_threads(threads)
+                    try:
+                        return run_node("ImageOverlay", **kwargs)
+                    finally:
+                        torch.set_num_threads(previous)
+                return call
+            yield f"Parallel/{mode}/w{workers}", _frame_mb(batch, size) * 3, batch * size * size, setup
+
+CASE_GROUPS = {
+    "ImageOverlay": overlay_cases,
+    "ImageOverlayStack": stack_cases,
+    "BlendMode": blend_mode_cases,
+    "ImageBlendWithAlpha": blend_with_alpha_cases,
+    "ImageColor": color_cases,
+    "ImageSelector": selector_cases,
+    "Parallel": parallel_cases,
+}
+
+_cleanup = []
+
+# ---------------------------------------------------------------------------
+# 启动（注册）耗时
+# ---------------------------------------------------------------------------
+
+# 注册阶段不应导入的模块
+HEAVY_MODULES = ("torch", "numpy", "PIL")
+
+_STARTUP_SCRIPT = """
+import importlib.util, json, sys, time
+start = time.perf_counter()
+spec = importlib.util.spec_from_file_location({name!r}, {init!r}, submodule_search_locations=[{path!r}])
+package = importlib.util.module_from_spec(spec)
+sys.modules[{name!r}] = package
+spec.loader.exec_module(package)
+for cls in package.NODE_CLASS_MAPPINGS.values():
+    cls.INPUT_TYPES()
+elapsed = time.perf_counter() - start
+print(json.dumps({{"ms": elapsed * 1000.0, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+def measure_startup(repeat):
+    """
+    在全新的解释器中加载插件并调用所有节点的 INPUT_TYPES（与 ComfyUI 注册节点时相同），
+    返回耗时中位数以及注册期间被导入的重量级模块。
+    """
+    script = _STARTUP_SCRIPT.format(name=PACKAGE_NAME, init=os.path.join(PACKAGE_DIR, "__init__.py"),
+                                    path=PACKAGE_DIR, heavy=HEAVY_MODULES)
+    runs = [json.loads(subprocess.check_output([sys.executable, "-c", script], text=True).splitlines()[-1])
+            for _ in range(max(1, repeat))]
+    return {
+        "wall_ms": statistics.median(run["ms"] for run in runs),
+        "heavy_modules": sorted({name for run in runs for name in run["heavy"]}),
+    }
+
+# ---------------------------------------------------------------------------
+# 运行与报告
+# ---------------------------------------------------------------------------
+
+def run_case(setup, repeat, warmup):
+    call = setup()
+    for _ in range(warmup):
+        call()
+    instrumentation = importlib.import_module(PACKAGE_NAME + ".Instrumentation")
+    stages = {}
+
+    def hook(node, name, seconds):
+        stages[f"{node}.{name}"] = stages.get(f"{node}.{name}", 0.0) + seconds
+
+    gc.collect()
+    reset_peak_rss()
+    instrumentation.add_stage_hook(hook)
+    times = []
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            call()
+            times.append(time.perf_counter() - start)
+    finally:
+        instrumentation.remove_stage_hook(hook)
+    return {
+        "wall_ms": statistics.median(times) * 1000.0,
+        "min_ms": min(times) * 1000.0,
+        "peak_rss_mb": peak_rss_mb(),
+        "stages_ms": {name: total * 1000.0 / repeat for name, total in sorted(stages.items())},
+    }
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=PACKAGE_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def environment_info():
+    import torch
+    return {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "threads": torch.get_num_threads(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+def report_scaling(results):
+    """
+    输出 Parallel 用例相对单线程（w1）的加速比。
+    """
+    rows = []
+    for case_id, result in results.items():
+        parts = case_id.split("/")
+        if parts[0] != "Parallel" or parts[2] == "w1":
+            continue
+        single = results.get("/".join(parts[:2] + ["w1"] + parts[3:]))
+        if single is not None:
+            rows.append((case_id, single["wall_ms"] / max(result["wall_ms"], 1e-9)))
+    if rows:
+        print(f"\n{'case':<52} {'speedup':>8}")
+        for case_id, speedup in rows:
+            print(f"{case_id:<52} {speedup:>8.2f}")
+
+def compare(results, baseline, threshold):
+    """
+    与基线比较耗时，返回回退的用例列表。
+    """
+    regressions = []
+    print(f"\n{'case':<52} {'base ms':>10} {'now ms':>10} {'ratio':>7}")
+    for case_id, result in results.items():
+        old = baseline.get("results", {}).get(case_id)
+        if old is None:
+            continue
+        ratio = result["wall_ms"] / max(old["wall_ms"], 1e-9)
+        flag = ""
+        if ratio > 1.0 + threshold:
+            flag = "  REGRESSION"
+            regressions.append(case_id)
+        elif ratio < 1.0 - threshold:
+            flag = "  faster"
+        print(f"{case_id:<52} {old['wall_ms']:>10.2f} {result['wall_ms']:>10.2f} {ratio:>7.2f}{flag}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark S4Tool nodes without a ComfyUI server.")
+    parser.add_argument("--nodes", nargs="+", choices=sorted(CASE_GROUPS), default=sorted(CASE_GROUPS))
+    parser.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_SIZES)
+    parser.add_argument("--batches", nargs="+", type=int, default=DEFAULT_BATCHES)
+    parser.add_argument("--filter", default="", help="only run cases whose id contains this text")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--max-memory-mb", type=float, default=4096.0,
+                        help="skip cases whose estimated working set exceeds this")
+    parser.add_argument("--output", help="write results as a JSON baseline")
+    parser.add_argument("--compare", help="compare against a JSON baseline")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="relative slowdown that counts as a regression (default 0.10)")
+    parser.add_argument("--startup", action="store_true",
+                        help="only measure node registration time in a fresh interpreter")
+    parser.add_argument("--startup-budget-ms", type=float, default=100.0,
+                        help="registration time that counts as too slow (default 100)")
+    args = parser.parse_args(argv)
+
+    if args.startup:
+        startup = measure_startup(args.repeat)
+        print(f"{'startup':<52} {startup['wall_ms']:>10.2f} ms")
+        if startup["heavy_modules"]:
+            print(f"registration imported {', '.join(startup['heavy_modules'])}")
+            return 1
+        if startup["wall_ms"] > args.startup_budget_ms:
+            print(f"registration slower than {args.startup_budget_ms:.0f} ms")
+            return 1
+        return 0
+
+    load_package()
+    results = {}
+    print(f"{'case':<52} {'wall ms':>10} {'MPix/s':>9} {'peak MB':>9}")
+    try:
+        for node in args.nodes:
+            for size in args.sizes:
+                for batch in args.batches:
+                    for name, estimate_mb, pixels, setup in CASE_GROUPS[node](size, batch):
+                        case_id = f"{name}/{size}px/b{batch}"
+                        if args.filter not in case_id:
+                            continue
+                        if estimate_mb > args.max_memory_mb:
+                            print(f"{case_id:<52} skipped (~{estimate_mb:.0f} MB)")
+                            continue
+                        result = run_case(setup, args.repeat, args.warmup)
+                        result["megapixels_per_s"] = pixels / 1e6 / max(result["wall_ms"] / 1000.0, 1e-9)
+                        results[case_id] = result
+                        print(f"{case_id:<52} {result['wall_ms']:>10.2f} {result['megapixels_per_s']:>9.1f} "
+                              f"{result['peak_rss_mb']:>9.0f}")
+                        gc.collect()
+    finally:
+        # 删除基准测试创建的临时图片（以及新建的空 images 目录）
+        for path in reversed(_cleanup):
+            if os.path.isfile(path):
+                os.remove(path)
+            elif os.path.isdir(path) and not os.listdir(path):
+                os.rmdir(path)
+
+    report_scaling(results)
+    report = {"environment": environment_info(), "results": results}
+    if args.output:
+        with open(args.output, "w") as handle:
+            json.dump(report, handle, indent=2, sort_keys=True)
+        print(f"\nBaseline written to {args.output}")
+    if args.compare:
+        with open(args.compare) as handle:
+            baseline = json.load(handle)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}")
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
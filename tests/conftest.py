@@ -0,0 +1,13 @@
+# 插件目录名不是合法的包名（含连字符），测试前以 "s4tool" 为名把它加载为包
+import importlib.util
+import os
+import sys
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if "s4tool" not in sys.modules:
+    spec = importlib.util.spec_from_file_location(
+        "s4tool", os.path.join(PACKAGE_DIR, "__init__.py"), submodule_search_locations=[PACKAGE_DIR])
+    package = importlib.util.module_from_spec(spec)
+    sys.modules["s4tool"] = package
+    spec.loader.exec_module(package)
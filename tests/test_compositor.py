@@ -0,0 +1,72 @@
+import pytest
+import torch
+
+from s4tool.ImageOverlay import ImageOverlay
+from s4tool.ImageOverlayStack import ImageOverlayLayer, ImageOverlayStack
+
+def _overlay(**kwargs):
+    inputs = {"Layer image": torch.rand(4, 8, 8, 3), "Background image": torch.rand(1, 64, 64, 3),
+              "x_position": 0, "y_position": 0, "mirror": "None", "rotation": 0.0, "scale": 1.0}
+    inputs.update(kwargs)
+    return ImageOverlay().blend_images(**inputs)[0]
+
+@pytest.mark.parametrize("output_alpha", [False, True])
+@pytest.mark.parametrize("placement", [
+    {"x_position": 10},
+    {"x_position": 1000},
+    {"x_position_list": "1000,1000,1000,1000"},
+    {"x_position": 10, "opacity": 0.0},
+])
+def test_overlay_output_batch(placement, output_alpha):
+    # 图层不可见（画布外或不透明度为 0）时输出批次也必须与图层批次一致
+    output = _overlay(output_alpha=output_alpha, **placement)
+    assert output.shape == (4, 64, 64, 4 if output_alpha else 3)
+
+def test_off_canvas_layer_keeps_background():
+    background = torch.rand(1, 64, 64, 3)
+    output = _overlay(**{"Background image": background, "x_position": 1000})
+    assert torch.equal(output, background.expand(4, -1, -1, -1))
+
+@pytest.mark.parametrize("x_position", [10, 1000])
+def test_stack_output_batch(x_position):
+    layers = ImageOverlayLayer().add_layer(**{"Layer image": torch.rand(4, 8, 8, 3), "x_position": x_position,
+                                              "y_position": 0, "mirror": "None", "rotation": 0.0, "scale": 1.0,
+                                              "opacity": 1.0, "blend_mode": "Normal"})[0]
+    output = ImageOverlayStack().stack_layers(**{"Background image": torch.rand(1, 64, 64, 3), "layers": layers})[0]
+    assert output.shape == (4, 64, 64, 3)
+
+@pytest.mark.parametrize("angle, k", [(90.0, 1), (-90.0, 3), (180.0, 2), (270.0, 3), (360.0, 0)])
+def test_right_angle_rotation_is_exact(angle, k):
+    from s4tool import Compositor
+
+    rgba = torch.rand(2, 5, 7, 4)
+    groups = Compositor.transform_layers(rgba, [1.0, 1.0], "Horizontal", [angle, angle], workers=1)
+    assert len(groups) == 1 and groups[0][0] == [0, 1]
+    assert torch.equal(groups[0][1], torch.rot90(torch.flip(rgba, dims=[2]), k=k, dims=(1, 2)))
+
+@pytest.mark.parametrize("cpus, torch_threads, expected", [(32, 32, 1), (32, 4, 8), (8, 1, 8), (1, 1, 1)])
+def test_default_workers_do_not_oversubscribe(monkeypatch, cpus, torch_threads, expected):
+    from s4tool import Compositor
+
+    monkeypatch.delenv("S4TOOL_WORKERS", raising=False)
+    monkeypatch.setattr(Compositor.os, "cpu_count", lambda: cpus)
+    monkeypatch.setattr(Compositor.torch, "get_num_threads", lambda: torch_threads)
+    assert Compositor.resolve_workers(0) == expected
+    assert Compositor.resolve_workers(3) == 3
+    monkeypatch.setenv("S4TOOL_WORKERS", "5")
+    assert Compositor.resolve_workers(0) == 5
+
+@pytest.mark.parametrize("channels", [3, 4])
+@pytest.mark.parametrize("blend_mode", ["Normal", "Multiply"])
+def test_tiled_alpha_output_matches_untiled(channels, blend_mode):
+    background = torch.rand(2, 70, 90, channels)
+    inputs = {"Background image": background, "Layer mask (optional)": torch.rand(1, 30, 40),
+              "x_position_list": "-5,50", "y_position": 20, "rotation": 30.0, "blend_mode": blend_mode,
+              "opacity": 0.7, "output_alpha": True, "Layer image": torch.rand(1, 30, 40, 3)}
+    untiled = _overlay(**inputs)
+    tiled = _overlay(tile_size=16, **inputs)
+    assert untiled.shape == (2, 70, 90, 4)
+    assert torch.equal(tiled, untiled)
+    # 图层未覆盖的像素保持背景（RGBA 背景保留其 alpha）
+    assert torch.allclose(untiled[:, -1, -1, 3], background[:, -1, -1, 3] if channels == 4 else torch.ones(2))
+    assert torch.allclose(untiled[:, -1, -1, :3], background[:, -1, -1, :3], atol=1e-6)
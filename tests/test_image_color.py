@@ -0,0 +1,61 @@
+import pytest
+import torch
+
+from s4tool.ImageColor import ImageColor, parse_gradient_stops, render_gradient
+
+def _render(stops_text, positions, extrapolate=False):
+    t = torch.tensor(positions, dtype=torch.float32).view(1, 1, -1)
+    return render_gradient(t, parse_gradient_stops(stops_text, "#000000", "#FFFFFF"), extrapolate)[0, 0]
+
+def test_hard_stop_switches_color():
+    colors = _render("#FF0000 0, #FF0000 0.5, #0000FF 0.5, #0000FF 1", [0.25, 0.49, 0.5, 0.75])
+    assert torch.equal(colors, torch.tensor([[1.0, 0, 0], [1.0, 0, 0], [0, 0, 1.0], [0, 0, 1.0]]))
+
+def test_explicit_stops_hold_end_colors():
+    colors = _render("#808080 0.3, #FFFFFF 0.7", [0.0, 0.3, 0.5, 0.7, 1.0])
+    grey = 128 / 255
+    assert colors[0, 0].item() == pytest.approx(grey)
+    assert colors[1, 0].item() == pytest.approx(grey)
+    assert colors[2, 0].item() == pytest.approx((grey + 1.0) / 2)
+    assert colors[3, 0].item() == pytest.approx(1.0)
+    assert colors[4, 0].item() == pytest.approx(1.0)
+
+def test_start_end_gradient_extrapolates():
+    # 未填写 gradient_stops 时与原实现一致：沿首尾两段外推后裁剪
+    stops = parse_gradient_stops("", "#404040", "#C0C0C0")
+    t = torch.tensor([-0.25, 0.0, 1.5]).view(1, 1, -1)
+    colors = render_gradient(t, stops, extrapolate=True)[0, 0, :, 0]
+    assert colors.tolist() == pytest.approx([32 / 255, 64 / 255, 1.0], abs=1e-6)
+
+def test_node_extrapolates_only_without_stops():
+    # 45 度时角落的投影位置超出 0-1
+    kwargs = dict(width=8, height=8, color_hex="#FFFFFF", gradient_enabled=True,
+                  gradient_start_hex="#404040", gradient_end_hex="#C0C0C0", gradient_angle=45.0)
+    implicit = ImageColor().generate_image(**kwargs)[0]
+    explicit = ImageColor().generate_image(**kwargs, gradient_stops="#404040 0, #C0C0C0 1")[0]
+    assert implicit.shape == explicit.shape == (1, 8, 8, 3)
+    assert implicit[0, 0, 0, 0].item() < 64 / 255
+    assert explicit[0, 0, 0, 0].item() == pytest.approx(64 / 255)
+    assert torch.allclose(implicit[0, 3:5, 3:5], explicit[0, 3:5, 3:5])
+
+def _gradient(**kwargs):
+    inputs = dict(width=16, height=12, color_hex="#FFFFFF", gradient_enabled=True,
+                  gradient_start_hex="#000000", gradient_end_hex="#FFFFFF", gradient_angle=0.0)
+    inputs.update(kwargs)
+    return ImageColor().generate_image(**inputs)[0]
+
+def test_angle_list_gives_one_frame_per_angle():
+    frames = _gradient(gradient_angle_list="0, 90, 180")
+    assert frames.shape == (3, 12, 16, 3)
+    for index, angle in enumerate((0.0, 90.0, 180.0)):
+        assert torch.equal(frames[index], _gradient(gradient_angle=angle)[0])
+    assert torch.equal(_gradient(gradient_angle_list="0, 90, 180", batch_size=3), frames)
+    with pytest.raises(ValueError):
+        _gradient(gradient_angle_list="0, 90, 180", batch_size=2)
+
+def test_identical_frames_are_broadcast():
+    frames = _gradient(gradient_angle_list="45, 45", batch_size=2)
+    assert frames.shape == (2, 12, 16, 3) and frames.stride(0) == 0
+    radial = _gradient(gradient_type="Radial", gradient_angle_list="0, 90")
+    assert radial.shape == (2, 12, 16, 3) and radial.stride(0) == 0
+    assert _gradient(batch_size=4).stride(0) == 0
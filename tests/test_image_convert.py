@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+import torch
+from PIL import Image
+from torch.utils._python_dispatch import TorchDispatchMode
+
+from s4tool import ImageConvert
+from s4tool.ImageConvert import IMAGE, MASK, pil_batch_to_tensor, pil_to_tensor, tensor_to_pil, tensor_to_pil_batch
+
+class FloatAllocations(TorchDispatchMode):
+    """
+    统计新分配存储的浮点张量：输出不与任何输入共享存储即视为一次分配（视图和原地运算不计）。
+    """
+    def __init__(self):
+        super().__init__()
+        self.count = 0
+
+    def __torch_dispatch__(self, func, types, args=(), kwargs=None):
+        kwargs = kwargs or {}
+        result = func(*args, **kwargs)
+        inputs = [value for value in list(args) + list(kwargs.values()) if isinstance(value, torch.Tensor)]
+        shared = {value.untyped_storage().data_ptr() for value in inputs}
+        outputs = result if isinstance(result, (tuple, list)) else [result]
+        for output in outputs:
+            if (isinstance(output, torch.Tensor) and output.is_floating_point()
+                    and output.untyped_storage().data_ptr() not in shared):
+                self.count += 1
+        return result
+
+def _pil(height, width, mode):
+    channels = {"L": 1, "RGB": 3, "RGBA": 4}[mode]
+    pixels = np.random.default_rng(height * width).integers(0, 256, (height, width, channels), dtype=np.uint8)
+    return Image.fromarray(pixels[..., 0] if channels == 1 else pixels, mode)
+
+@pytest.mark.parametrize("height", [3, 4, 17])
+@pytest.mark.parametrize("mode, channels", [("RGB", 3), ("RGBA", 4), ("L", 1)])
+def test_image_shape(height, mode, channels):
+    tensor = pil_to_tensor(_pil(height, 5, mode), IMAGE)
+    assert tensor.shape == (1, height, 5, channels)
+    assert tensor.dtype == torch.float32
+
+@pytest.mark.parametrize("height", [3, 4, 17])
+@pytest.mark.parametrize("mode", ["RGB", "RGBA", "L"])
+def test_mask_shape(height, mode):
+    assert pil_to_tensor(_pil(height, 5, mode), MASK).shape == (1, height, 5)
+
+@pytest.mark.parametrize("height", [3, 4])
+def test_round_trip_keeps_layout(height):
+    image = _pil(height, 5, "RGB")
+    back = tensor_to_pil(pil_to_tensor(image, IMAGE), IMAGE)
+    assert back.size == (5, height) and back.mode == "RGB"
+    mask = _pil(height, 5, "L")
+    back = tensor_to_pil(pil_to_tensor(mask, MASK), MASK)
+    assert back.size == (5, height) and back.mode == "L"
+    assert np.array_equal(np.array(back), np.array(mask))
+
+def test_unbatched_tensors():
+    assert tensor_to_pil(torch.rand(3, 10, 4), IMAGE).size == (10, 3)
+    assert tensor_to_pil(torch.rand(10, 3), MASK).size == (3, 10)
+    assert tensor_to_pil(torch.rand(1, 10, 3), MASK).size == (3, 10)
+
+def test_batch_shapes():
+    images = [_pil(4, 6, "RGBA") for _ in range(3)]
+    assert pil_batch_to_tensor(images, IMAGE).shape == (3, 4, 6, 4)
+    assert pil_batch_to_tensor(images, MASK).shape == (3, 4, 6)
+    assert [image.size for image in tensor_to_pil_batch(torch.rand(2, 4, 6, 3), IMAGE)] == [(6, 4), (6, 4)]
+    with pytest.raises(ValueError):
+        pil_batch_to_tensor([_pil(4, 6, "RGB"), _pil(5, 6, "RGB")], IMAGE)
+
+def test_uint8_shares_decoded_buffer(monkeypatch):
+    arrays = []
+    original = ImageConvert._pil_array
+
+    def record(image):
+        arrays.append(original(image))
+        return arrays[-1]
+
+    monkeypatch.setattr(ImageConvert, "_pil_array", record)
+    tensor = pil_to_tensor(_pil(4, 5, "RGBA"), IMAGE, torch.uint8)
+    assert tensor.dtype == torch.uint8
+    assert tensor.data_ptr() == arrays[0].ctypes.data
+
+def test_uint8_tensor_to_pil_is_not_widened():
+    tensor = torch.randint(0, 256, (1, 4, 5, 3), dtype=torch.uint8)
+    with FloatAllocations() as counter:
+        image = tensor_to_pil(tensor, IMAGE)
+    assert counter.count == 0
+    assert np.array_equal(np.array(image), tensor[0].numpy())
+
+def test_single_float_allocation():
+    image = _pil(4, 5, "RGBA")
+    with FloatAllocations() as counter:
+        tensor = pil_to_tensor(image, IMAGE)
+    assert counter.count == 1
+    assert torch.equal(tensor, torch.from_numpy(np.array(image)).unsqueeze(0).float() / 255.0)
+
+def test_batch_single_float_allocation():
+    images = [_pil(4, 5, "RGB") for _ in range(4)]
+    with FloatAllocations() as counter:
+        pil_batch_to_tensor(images, IMAGE)
+    assert counter.count == 1
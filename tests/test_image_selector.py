@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+import torch
+from PIL import Image
+
+from s4tool.ImageSelector import decode_image
+
+@pytest.fixture(params=["gif", "webp"])
+def animation(tmp_path, request):
+    frames = [Image.fromarray(np.full((6, 9, 3), 40 * index, dtype=np.uint8), "RGB").convert("RGBA")
+              for index in range(5)]
+    path = str(tmp_path / f"animation.{request.param}")
+    options = {"lossless": True} if request.param == "webp" else {}
+    frames[0].save(path, save_all=True, append_images=frames[1:], duration=40, loop=0, **options)
+    return path
+
+def test_animation_frames(animation):
+    image, mask = decode_image(animation, (1, 2, 2))
+    assert image.shape == (2, 6, 9, 3) and mask.shape == (2, 6, 9)
+    assert image[:, 0, 0, 0].tolist() == pytest.approx([40 / 255, 120 / 255])
+    assert torch.all(mask == 0.0)
+
+@pytest.mark.parametrize("frames", [(0, 0, 1), (10, 0, 1)])
+def test_decode_closes_file(animation, frames, monkeypatch):
+    # 正常解码和 "No frames selected" 出错时都要关闭文件
+    opened = []
+    original = Image.open
+
+    def record(*args, **kwargs):
+        opened.append(original(*args, **kwargs))
+        return opened[-1]
+
+    monkeypatch.setattr(Image, "open", record)
+    if frames[0] >= 5:
+        with pytest.raises(ValueError):
+            decode_image(animation, frames)
+    else:
+        decode_image(animation, frames)
+    assert len(opened) == 1 and opened[0].fp is None
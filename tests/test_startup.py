@@ -0,0 +1,45 @@
+import glob
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 与 benchmarks/bench_nodes.py 的 --startup 相同：全新解释器中加载插件并调用所有 INPUT_TYPES
+STARTUP_SCRIPT = """
+import importlib.util, json, os, sys, time
+path = sys.argv[1]
+start = time.perf_counter()
+spec = importlib.util.spec_from_file_location("s4tool", os.path.join(path, "__init__.py"),
+                                              submodule_search_locations=[path])
+package = importlib.util.module_from_spec(spec)
+sys.modules["s4tool"] = package
+spec.loader.exec_module(package)
+for cls in package.NODE_CLASS_MAPPINGS.values():
+    cls.INPUT_TYPES()
+elapsed = time.perf_counter() - start
+print(json.dumps({"ms": elapsed * 1000.0, "modules": sorted(sys.modules)}))
+"""
+
+# 宽松的时间预算：测量值通常在 10-20ms，主要用于发现注册时意外导入重量级依赖或扫描文件
+BUDGET_MS = 1000.0
+
+def _register(path):
+    output = subprocess.check_output([sys.executable, "-c", STARTUP_SCRIPT, path], text=True)
+    return json.loads(output.splitlines()[-1])
+
+def test_registration_is_light(tmp_path):
+    # 复制到没有 images 目录的位置，确认注册时不会创建它
+    plugin_dir = tmp_path / "plugin"
+    plugin_dir.mkdir()
+    for source in glob.glob(os.path.join(PACKAGE_DIR, "*.py")):
+        shutil.copy(source, plugin_dir)
+
+    result = _register(str(plugin_dir))
+    heavy = [name for name in result["modules"] if name.split(".")[0] in ("torch", "numpy", "PIL")]
+    assert heavy == []
+    assert result["ms"] < BUDGET_MS
+    assert not (plugin_dir / "images").exists()
+    assert not (plugin_dir / "image_cache").exists()